@@ -1,16 +1,24 @@
 from flask import Flask
 from flask_cors import CORS
-from db import engine, Base
+from db import engine, close_session
 from routes.activity_routes import activity_routes_blueprint
 from routes.auth_routes import auth_routes_blueprint
 from routes.organizer_routes import organizer_routes_blueprint
+from routes.avatar_routes import avatar_routes_blueprint
+from routes.metrics_routes import metrics_routes_blueprint
+from routes.feed_routes import feed_routes_blueprint
 from dotenv import load_dotenv
 import os
 from extensions import limiter
+from migrations import run_migrations
+from utils.maintenance import maintenance, run_maintenance
+from utils.metrics import instrument_app
+from utils.serializers import FastJSONProvider
 
 load_dotenv()
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 
 # Initialize extensions
 limiter.init_app(app)
@@ -20,13 +28,44 @@ CORS(app, supports_credentials=True, origins=["http://localhost:3000"])
 app.config["SECRET_KEY"] = os.getenv("SECRET_KEY")
 app.config["ALGORITHM"] = os.getenv("ALGORITHM")
 
+# Request latency and SQL statement counts per endpoint, served at /metrics
+instrument_app(app, engine)
+
+# One database session per request, closed when the request ends
+app.teardown_appcontext(close_session)
+
 # Register Blueprints
 app.register_blueprint(activity_routes_blueprint)
 app.register_blueprint(auth_routes_blueprint)
 app.register_blueprint(organizer_routes_blueprint)
+app.register_blueprint(avatar_routes_blueprint)
+app.register_blueprint(metrics_routes_blueprint)
+app.register_blueprint(feed_routes_blueprint)
+
+# Avatars are immutable and cached by browsers, and calendar apps poll feeds around the clock
+# (an unchanged feed is a single narrow query and a 304), so keep them out of the default limits
+limiter.exempt(avatar_routes_blueprint)
+limiter.exempt(metrics_routes_blueprint)
+limiter.exempt(feed_routes_blueprint)
+
+# Archiving and cleanup run in a background thread, started by the first request
+app.before_request(maintenance.ensure_thread)
+
+
+@app.cli.command("maintenance")
+def maintenance_command():
+    """Archive old activities, prune expired revocations and optimize the database now."""
+    result = run_maintenance(force=True)
+    print(f"Archived {result['archived']} activities, pruned {result['revocationsPruned']} revoked tokens")
+
+@app.cli.command("migrate")
+def migrate_command():
+    """Create missing tables and bring the database schema up to date. Run once per deploy, before the workers start."""
+    run_migrations(engine)
+    print("Database is up to date")
 
-# Create DB tables
-Base.metadata.create_all(bind=engine)
 
 if __name__ == "__main__":
+    # The development server migrates on start; deployments run `flask --app app migrate` once
+    run_migrations(engine)
     app.run(debug=True)
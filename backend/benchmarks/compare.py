@@ -0,0 +1,69 @@
+"""
+Compare two benchmark result files route by route.
+
+    python -m benchmarks.compare benchmarks/results/old.json benchmarks/results/new.json
+
+Exits with status 1 when a route's p95 latency grew by more than --threshold percent,
+or when it now runs more SQL queries per request.
+"""
+import argparse
+import json
+import sys
+
+
+def _change(old, new):
+    if not old:
+        return None
+    return (new - old) / old * 100
+
+
+def compare_section(name: str, old: dict, new: dict, threshold: float) -> list:
+    regressions = []
+    print(f"\n{name}")
+    print(f"{'route':<22}{'p50 ms':>18}{'p95 ms':>18}{'rps':>18}{'queries':>14}")
+    for route in sorted(set(old) | set(new)):
+        if route not in old or route not in new:
+            print(f"{route:<22} only in {'new' if route in new else 'old'} results")
+            continue
+        before, after = old[route], new[route]
+        cells = []
+        for key in ["p50_ms", "p95_ms", "throughput_rps"]:
+            change = _change(before[key], after[key])
+            cells.append(f"{after[key]:>9} ({change:+.0f}%)" if change is not None else f"{after[key]:>16}")
+        queries_before, queries_after = before["queries_per_request"], after["queries_per_request"]
+        print(f"{route:<22}" + "".join(f"{cell:>18}" for cell in cells) + f"{queries_before!s:>6} ->{queries_after!s:>5}")
+
+        p95_change = _change(before["p95_ms"], after["p95_ms"])
+        if p95_change is not None and p95_change > threshold:
+            regressions.append(f"{name}/{route}: p95 {before['p95_ms']} -> {after['p95_ms']} ms")
+        if queries_before is not None and queries_after is not None and queries_after > queries_before:
+            regressions.append(f"{name}/{route}: queries per request {queries_before} -> {queries_after}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10, help="allowed p95 increase, in percent")
+    args = parser.parse_args(argv)
+
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    print(f"{old.get('commit')} -> {new.get('commit')}")
+
+    regressions = compare_section("Sequential", old["sequential"], new["sequential"], args.threshold)
+    if "load" in old and "load" in new:
+        regressions += compare_section("Load", old["load"]["routes"], new["load"]["routes"], args.threshold)
+
+    if regressions:
+        print("\nRegressions:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Load benchmarks for the BrightTimes API.
+
+Seeds a dedicated SQLite database, runs every scenario sequentially through the
+Flask test client, then optionally drives a weighted mix from several processes.
+Reads are measured twice in the sequential run: with the response cache cleared
+before every request, and again as "<scenario>_warm" with the cache left alone.
+Results are written as JSON so runs from different commits can be compared with
+benchmarks/compare.py.
+
+Run from the backend directory:
+    python -m benchmarks.run --activities 200000 --processes 4 --duration 30
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", default=str(BENCHMARK_DIR / "benchmark.db"), help="SQLite file to seed and use")
+    parser.add_argument("--reuse", action="store_true", help="reuse an already seeded database")
+    parser.add_argument("--organizers", type=int, default=1000)
+    parser.add_argument("--activities", type=int, default=200_000)
+    parser.add_argument("--revoked-tokens", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=5, help="unmeasured requests per scenario")
+    parser.add_argument("--cold-cache", action="store_true", help="clear the response cache before each load request")
+    parser.add_argument("--only", nargs="*", help="run only these scenarios")
+    parser.add_argument("--processes", type=int, default=0, help="load generator processes, 0 to skip")
+    parser.add_argument("--duration", type=float, default=10, help="load generator run time, in seconds")
+    parser.add_argument("--url", help="drive a running server instead of the in-process app")
+    parser.add_argument("--rate-limit", action="store_true", help="keep the rate limiter enabled")
+    parser.add_argument("--output", help="results file, defaults to benchmarks/results/<commit>-<time>.json")
+    return parser.parse_args(argv)
+
+
+def configure_environment(args):
+    # Must run before the app is imported, config.py reads these at import time
+    database = Path(args.database).resolve()
+    os.environ["DATABASE_URL"] = f"sqlite:///{database}"
+    os.environ["RATELIMIT_STORAGE_URI"] = f"sqlite:///{database.with_suffix('.ratelimits.db')}"
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-that-is-long-enough-for-hs256")
+    os.environ.setdefault("ALGORITHM", "HS256")
+    # The seeded history is part of the workload, keep the archiver from moving it mid-run
+    os.environ["MAINTENANCE_INTERVAL_SECONDS"] = "0"
+
+
+def load_app(rate_limit: bool):
+    from app import app
+    from db import engine
+    from extensions import limiter
+    from benchmarks.stats import QueryCounter
+
+    limiter.enabled = rate_limit
+    return app, engine, QueryCounter(engine)
+
+
+def seed_database(args, engine):
+    from benchmarks.seed import seed
+
+    info_path = Path(args.database).with_suffix(".json")
+    if args.reuse and info_path.exists():
+        return json.loads(info_path.read_text())
+    started = time.perf_counter()
+    info = seed(engine, args.organizers, args.activities, args.revoked_tokens, args.seed)
+    info["seconds"] = round(time.perf_counter() - started, 2)
+    info_path.write_text(json.dumps(info))
+    return info
+
+
+def remove_database(path: str):
+    database = Path(path)
+    for file in [database, database.with_suffix(".json"), database.with_suffix(".ratelimits.db")]:
+        for candidate in [file, Path(f"{file}-wal"), Path(f"{file}-shm")]:
+            candidate.unlink(missing_ok=True)
+
+
+def make_driver(args, app):
+    from benchmarks.scenarios import HttpDriver, TestClientDriver
+
+    return HttpDriver(args.url) if args.url else TestClientDriver(app)
+
+
+def select_scenarios(args, ctx):
+    from benchmarks.scenarios import SCENARIOS, available
+
+    scenarios = available(SCENARIOS, ctx)
+    if args.only:
+        scenarios = [s for s in scenarios if s.name in args.only]
+    return scenarios
+
+
+def run_sequential(args, driver, ctx, query_counter):
+    """Every scenario in turn, one request at a time; reads once cold and once warm."""
+    from benchmarks.scenarios import send
+    from benchmarks.stats import Recorder
+    from utils.response_cache import response_cache
+
+    rng = random.Random(args.seed)
+    recorder = Recorder()
+    for scenario in select_scenarios(args, ctx):
+        count = min(args.requests, scenario.max_requests or args.requests)
+        # A running server's cache can't be cleared from here, so --url only measures it warm
+        if not scenario.cacheable:
+            passes = [(scenario.name, False)]
+        elif args.url:
+            passes = [(f"{scenario.name}_warm", False)]
+        else:
+            passes = [(scenario.name, True), (f"{scenario.name}_warm", False)]
+        for name, cold in passes:
+            for i in range(args.warmup + count):
+                if cold:
+                    response_cache.clear()
+                status, elapsed = send(driver, scenario, rng, ctx, on_start=query_counter.reset)
+                queries = None if args.url else query_counter.reset()
+                if i >= args.warmup:
+                    recorder.record(name, elapsed, status, queries)
+    return recorder.summary()
+
+
+def load_worker(args, worker_id: int, start_at: float) -> dict:
+    """Runs in a separate process: sends a weighted mix of requests for args.duration seconds."""
+    from benchmarks.scenarios import prepare, send
+    from benchmarks.stats import Recorder
+    from utils.response_cache import response_cache
+
+    app, _, query_counter = load_app(args.rate_limit)
+    driver = make_driver(args, app)
+    ctx = prepare(driver, args.organizers, args.activities)
+    scenarios = select_scenarios(args, ctx)
+    weights = [s.weight for s in scenarios]
+    rng = random.Random(args.seed + worker_id)
+    recorder = Recorder()
+
+    # All workers start together once they've imported the app and logged in
+    time.sleep(max(0.0, start_at - time.time()))
+    deadline = start_at + args.duration
+    while time.time() < deadline:
+        scenario = rng.choices(scenarios, weights)[0]
+        if args.cold_cache:
+            response_cache.clear()
+        status, elapsed = send(driver, scenario, rng, ctx, on_start=query_counter.reset)
+        recorder.record(scenario.name, elapsed, status, None if args.url else query_counter.reset())
+    return recorder.dump()
+
+
+def run_load(args):
+    from benchmarks.stats import Recorder
+
+    # Spawned workers start clean: no engine or pool connections inherited across fork
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(args.processes) as pool:
+        # Workers get a few seconds to import the app and log in, then start together
+        start_at = time.time() + 5
+        results = pool.starmap(load_worker, [(args, i, start_at) for i in range(args.processes)])
+    recorder = Recorder()
+    for result in results:
+        recorder.merge(result)
+    routes = recorder.summary(wall_seconds=args.duration)
+    total = sum(route["requests"] for route in routes.values())
+    return {
+        "processes": args.processes,
+        "duration_seconds": args.duration,
+        "requests": total,
+        "throughput_rps": round(total / args.duration, 2),
+        "routes": routes,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True, cwd=BENCHMARK_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(title: str, routes: dict):
+    print(f"\n{title}")
+    print(f"{'route':<28}{'req':>7}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}")
+    for name, stats in routes.items():
+        queries = "-" if stats["queries_per_request"] is None else stats["queries_per_request"]
+        print(
+            f"{name:<28}{stats['requests']:>7}{stats['throughput_rps']:>10}{stats['p50_ms']:>10}"
+            f"{stats['p95_ms']:>10}{stats['p99_ms']:>10}{queries:>9}"
+        )
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    configure_environment(args)
+    if not args.reuse and not args.url:
+        remove_database(args.database)
+
+    app, engine, query_counter = load_app(args.rate_limit)
+    dataset = None
+    if not args.url:
+        from migrations import run_migrations
+
+        run_migrations(engine)
+        dataset = seed_database(args, engine)
+        args.organizers, args.activities = dataset["organizers"], dataset["activities"]
+
+    from benchmarks.scenarios import prepare
+
+    driver = make_driver(args, app)
+    ctx = prepare(driver, args.organizers, args.activities)
+
+    results = {
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "target": args.url or "test-client",
+        "dataset": dataset,
+        "options": {"requests": args.requests, "warmup": args.warmup, "cold_cache": args.cold_cache},
+        "sequential": run_sequential(args, driver, ctx, query_counter),
+    }
+    print_table("Sequential", results["sequential"])
+
+    if args.processes:
+        results["load"] = run_load(args)
+        print_table(f"Load ({args.processes} processes, {args.duration}s)", results["load"]["routes"])
+
+    output = Path(args.output) if args.output else (
+        BENCHMARK_DIR / "results" / f"{results['commit'] or 'unknown'}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+import base64
+import io
+import json
+import time
+import urllib.error
+import urllib.request
+from dataclasses import dataclass
+from typing import Callable
+from PIL import Image
+from benchmarks.seed import AGE_GROUPS, JOIN_LINKS, PASSWORD, TOPICS, WORDS
+
+BULK_ROWS = 50  # activities per bulk_import request
+
+
+class TestClientDriver:
+    """Sends requests through the Flask test client, in this process."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, headers=None, body=None):
+        if isinstance(body, bytes):
+            response = self.client.open(path, method=method, headers=headers, data=body)
+        else:
+            response = self.client.open(path, method=method, headers=headers, json=body)
+        data = response.get_data()  # drains streamed responses too
+        return response.status_code, _parse(data)
+
+
+class HttpDriver:
+    """Sends requests to a running server, e.g. one started with gunicorn."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+
+    def request(self, method, path, headers=None, body=None):
+        headers = dict(headers or {})
+        data = None
+        if isinstance(body, bytes):
+            data = body
+        elif body is not None:
+            data = json.dumps(body).encode()
+            headers["Content-Type"] = "application/json"
+        request = urllib.request.Request(self.base_url + path, data=data, method=method, headers=headers)
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, _parse(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, _parse(e.read())
+
+
+def _parse(data: bytes):
+    try:
+        return json.loads(data)
+    except ValueError:
+        return None
+
+
+@dataclass
+class Context:
+    """What scenarios need to know about the seeded database."""
+    organizers: int
+    activities: int
+    headers: dict
+    refresh_headers: dict
+    own_activity_ids: list
+    avatar_hash: str | None
+
+
+def _avatar() -> str:
+    # A 256x256 PNG, the size of a typical uploaded avatar
+    output = io.BytesIO()
+    Image.new("RGB", (256, 256), (74, 144, 226)).save(output, format="PNG")
+    return "data:image/png;base64," + base64.b64encode(output.getvalue()).decode()
+
+
+AVATAR = _avatar()
+
+
+def _login(driver) -> dict:
+    status, payload = driver.request("POST", "/auth/login", body={"username": "organizer0", "password": PASSWORD})
+    if status != 200:
+        raise RuntimeError(f"Benchmark login failed ({status}): {payload}")
+    return payload
+
+
+def prepare(driver, organizers: int, activities: int) -> Context:
+    # The benchmark acts as the first seeded organizer, with an uploaded avatar
+    tokens = _login(driver)
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    refresh_headers = {"Authorization": f"Bearer {tokens['refresh_token']}"}
+    driver.request("PUT", "/organizer/me", headers=headers, body={"avatarBase64": AVATAR})
+    _, me = driver.request("GET", "/organizer/me", headers=headers)
+    avatar_url = (me or {}).get("avatar_url")
+    _, mine = driver.request("GET", "/activities/mine?limit=100", headers=headers)
+    own_ids = [activity["id"] for activity in (mine or {}).get("activities", [])]
+    return Context(
+        organizers, activities, headers, refresh_headers, own_ids,
+        avatar_url.rsplit("/", 1)[-1] if avatar_url else None,
+    )
+
+
+def _new_activity(rng, ctx):
+    start_time = f"{rng.randint(8, 19):02d}:{rng.choice(['00', '30'])}"
+    return {
+        "title": f"Benchmark {rng.choice(WORDS)}",
+        "description": "Created by the benchmark suite",
+        "topic": rng.choice(TOPICS),
+        "age_group": rng.choice(AGE_GROUPS),
+        "date": f"2031-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "time": start_time,
+        "duration": "01:00",
+        "timezone": "UTC",
+        "join_link": rng.choice(JOIN_LINKS),
+        "allow_overlap": True,  # random times clash with the organizer's seeded sessions
+    }
+
+
+def _bulk_rows(rng, ctx) -> bytes:
+    return "".join(json.dumps(_new_activity(rng, ctx)) + "\n" for _ in range(BULK_ROWS)).encode()
+
+
+# Setup functions make unmeasured requests before a measured one and return overrides for it
+
+def _fresh_token(driver, rng, ctx) -> dict:
+    # Logout revokes the token it is sent with, so every request needs its own
+    return {"headers": {"Authorization": f"Bearer {_login(driver)['access_token']}"}}
+
+
+def _refresh_token(driver, rng, ctx) -> dict:
+    return {"headers": ctx.refresh_headers}
+
+
+def _new_own_activity(driver, rng, ctx) -> dict:
+    # Deletes remove an activity created for the purpose, the seeded data stays as it is
+    _, payload = driver.request("POST", "/activities", headers=ctx.headers, body=_new_activity(rng, ctx))
+    return {"path": f"/activities/{payload['id']}"}
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    path: Callable
+    body: Callable | None = None
+    auth: bool = False
+    weight: int = 10  # share of the multi-process load mix
+    max_requests: int | None = None  # caps very heavy routes in the sequential suite
+    needs_own_activity: bool = False
+    needs_avatar: bool = False
+    content_type: str | None = None
+    setup: Callable | None = None
+
+    @property
+    def cacheable(self) -> bool:
+        # Reads can be served from the response cache, so they are measured cold and warm
+        return self.method == "GET"
+
+
+SCENARIOS = [
+    Scenario("list_all", "GET", lambda rng, ctx: "/activities", weight=1, max_requests=10),
+    Scenario("list_page", "GET", lambda rng, ctx: "/activities?limit=50", weight=20),
+    Scenario(
+        "list_filtered", "GET",
+        lambda rng, ctx: f"/activities?topic={rng.choice(TOPICS)}&age_group={rng.choice(AGE_GROUPS)}&limit=50",
+        weight=20,
+    ),
+    Scenario("search", "GET", lambda rng, ctx: f"/activities?q={rng.choice(WORDS)}&limit=20", weight=10),
+    Scenario(
+        "stream_filtered", "GET",
+        lambda rng, ctx: f"/activities?topic={rng.choice(TOPICS)}&age_group={rng.choice(AGE_GROUPS)}&stream=1",
+        weight=1, max_requests=20,
+    ),
+    Scenario("activity", "GET", lambda rng, ctx: f"/activities/{rng.randint(1, ctx.activities)}", weight=30),
+    Scenario(
+        "organizer_activities", "GET",
+        lambda rng, ctx: f"/activities/organizer/{rng.randint(1, ctx.organizers)}", weight=10,
+    ),
+    Scenario("live", "GET", lambda rng, ctx: "/activities/live?within=120", weight=5),
+    Scenario("feed", "GET", lambda rng, ctx: "/activities/feed.ics", weight=1, max_requests=10),
+    Scenario(
+        "organizer_feed", "GET",
+        lambda rng, ctx: f"/activities/organizer/{rng.randint(1, ctx.organizers)}/feed.ics", weight=5,
+    ),
+    Scenario("topics", "GET", lambda rng, ctx: "/activities/topics", weight=10),
+    Scenario("age_groups", "GET", lambda rng, ctx: "/activities/age_groups", weight=10),
+    Scenario("facets", "GET", lambda rng, ctx: "/activities/facets", weight=5),
+    Scenario("join", "POST", lambda rng, ctx: f"/activities/{rng.randint(1, ctx.activities)}/join", weight=10),
+    Scenario(
+        "login", "POST", lambda rng, ctx: "/auth/login",
+        body=lambda rng, ctx: {"username": f"organizer{rng.randrange(ctx.organizers)}", "password": PASSWORD},
+        weight=1, max_requests=50,
+    ),
+    Scenario("refresh", "POST", lambda rng, ctx: "/auth/refresh", setup=_refresh_token, weight=1),
+    Scenario("logout", "POST", lambda rng, ctx: "/auth/logout", setup=_fresh_token, weight=1, max_requests=50),
+    Scenario(
+        "avatar", "GET", lambda rng, ctx: f"/avatars/{ctx.avatar_hash}", weight=5, needs_avatar=True,
+    ),
+    Scenario(
+        "avatar_thumbnail", "GET", lambda rng, ctx: f"/avatars/{ctx.avatar_hash}/thumbnail",
+        weight=10, needs_avatar=True,
+    ),
+    Scenario("my_activities", "GET", lambda rng, ctx: "/activities/mine?limit=50", auth=True, weight=5),
+    Scenario("my_history", "GET", lambda rng, ctx: "/activities/mine/history?limit=50", auth=True, weight=2),
+    Scenario(
+        "export", "GET", lambda rng, ctx: "/activities/mine/export?format=csv", auth=True, weight=1, max_requests=20,
+    ),
+    Scenario("organizer_me", "GET", lambda rng, ctx: "/organizer/me", auth=True, weight=5),
+    Scenario(
+        "update_profile", "PUT", lambda rng, ctx: "/organizer/me",
+        body=lambda rng, ctx: {"bio": f"Teaches {rng.choice(WORDS)}", "avatarBase64": AVATAR},
+        auth=True, weight=1,
+    ),
+    Scenario("create_activity", "POST", lambda rng, ctx: "/activities", body=_new_activity, auth=True, weight=2),
+    Scenario(
+        "update_activity", "PUT",
+        lambda rng, ctx: f"/activities/{rng.choice(ctx.own_activity_ids)}",
+        body=lambda rng, ctx: {"title": f"Updated {rng.choice(WORDS)}"},
+        auth=True, weight=2, needs_own_activity=True,
+    ),
+    Scenario(
+        "delete_activity", "DELETE", lambda rng, ctx: None, auth=True, weight=1, setup=_new_own_activity,
+    ),
+    Scenario(
+        "bulk_import", "POST", lambda rng, ctx: "/activities/bulk", body=_bulk_rows,
+        content_type="application/x-ndjson", auth=True, weight=1, max_requests=20,
+    ),
+]
+
+
+def available(scenarios, ctx: Context) -> list:
+    return [
+        s for s in scenarios
+        if (ctx.own_activity_ids or not s.needs_own_activity) and (ctx.avatar_hash or not s.needs_avatar)
+    ]
+
+
+def send(driver, scenario: Scenario, rng, ctx: Context, on_start: Callable | None = None) -> tuple[int, float]:
+    """
+    Send one request for scenario; returns its status and latency in seconds.
+
+    Setup requests are not included; on_start runs after them, right before the measured request.
+    """
+    overrides = scenario.setup(driver, rng, ctx) if scenario.setup else {}
+    path = overrides.get("path") or scenario.path(rng, ctx)
+    body = scenario.body(rng, ctx) if scenario.body else None
+    headers = dict(overrides.get("headers") or (ctx.headers if scenario.auth else {}))
+    if scenario.content_type:
+        headers["Content-Type"] = scenario.content_type
+    if on_start:
+        on_start()
+    started = time.perf_counter()
+    status, _ = driver.request(scenario.method, path, headers=headers, body=body)
+    return status, time.perf_counter() - started
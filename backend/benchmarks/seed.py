@@ -0,0 +1,93 @@
+import random
+from datetime import date, timedelta
+from sqlalchemy import insert
+from models import Activity, Organizer, TokenBlocklist
+from utils.security import hash_password
+from utils.timezones import utc_now
+
+BATCH_SIZE = 5000
+PASSWORD = "benchmark"
+
+TOPICS = ["Math", "Science", "Art", "Music", "Reading", "Coding", "Cooking", "Sports", "History", "Languages"]
+AGE_GROUPS = ["3-5", "6-8", "9-12", "13-15", "16-18"]
+WORDS = [
+    "fun", "dinosaurs", "space", "painting", "fractions", "robots", "stories", "guitar", "chemistry",
+    "origami", "poetry", "ocean", "planets", "drawing", "puzzles", "baking", "yoga", "chess", "maps", "insects",
+]
+JOIN_LINKS = ["https://meet.google.com/abc-defg-hij", "https://zoom.us/j/1234567890"]
+
+
+def _insert_batches(connection, table, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            connection.execute(insert(table), batch)
+            batch = []
+    if batch:
+        connection.execute(insert(table), batch)
+
+
+def _organizers(count, password_hash):
+    for i in range(count):
+        yield {
+            "username": f"organizer{i}",
+            "password_hash": password_hash,
+            "name": f"Organizer {i}",
+            "bio": "Benchmark organizer",
+            "joined_date": date.today(),
+        }
+
+
+def _activities(rng, count, organizers, now):
+    for i in range(count):
+        # Roughly one in six activities is already in the past
+        starts_at = now + timedelta(minutes=15 * rng.randint(-60 * 96, 365 * 96))
+        duration = rng.choice([30, 45, 60, 90, 120])
+        words = rng.sample(WORDS, 3)
+        yield {
+            "title": f"{words[0].title()} {words[1]} #{i}",
+            "description": f"An online session about {words[0]}, {words[1]} and {words[2]}.",
+            "topic": rng.choice(TOPICS),
+            "age_group": rng.choice(AGE_GROUPS),
+            "date": starts_at.date(),
+            "time": starts_at.strftime("%H:%M"),
+            "timezone": "UTC",
+            "starts_at": starts_at,
+            "ends_at": starts_at + timedelta(minutes=duration),
+            "join_link": rng.choice(JOIN_LINKS),
+            "duration": f"{duration // 60:02d}:{duration % 60:02d}",
+            "materials": "",
+            "total_times_join_pressed": rng.randint(0, 50),
+            "organizer_id": rng.randint(1, organizers),
+        }
+
+
+def _revoked_tokens(rng, count, now):
+    for _ in range(count):
+        yield {
+            "jti": f"{rng.getrandbits(128):032x}",
+            "created_at": date.today(),
+            # Half are already expired and only matter to the initial revocation load
+            "expires_at": now + timedelta(minutes=rng.randint(-24 * 60, 24 * 60)),
+        }
+
+
+def seed(engine, organizers=1000, activities=200_000, revoked_tokens=50_000, seed=42) -> dict:
+    """
+    Fill an empty database with synthetic organizers, activities and revoked tokens.
+
+    The same seed always produces the same rows; start times are relative to now,
+    so the share of upcoming activities stays stable between runs.
+    """
+    rng = random.Random(seed)
+    now = utc_now().replace(second=0, microsecond=0)
+    # Every organizer shares one password, hashing it per row would dominate seeding
+    password_hash = hash_password(PASSWORD)
+
+    with engine.begin() as connection:
+        _insert_batches(connection, Organizer.__table__, _organizers(organizers, password_hash))
+        _insert_batches(connection, Activity.__table__, _activities(rng, activities, organizers, now))
+        _insert_batches(connection, TokenBlocklist.__table__, _revoked_tokens(rng, revoked_tokens, now))
+
+    return {"organizers": organizers, "activities": activities, "revoked_tokens": revoked_tokens, "seed": seed}
@@ -0,0 +1,84 @@
+import threading
+from collections import Counter, defaultdict
+from sqlalchemy import event
+
+
+class QueryCounter:
+    """Counts SQL statements executed by the current thread, via engine events."""
+
+    def __init__(self, engine):
+        self._local = threading.local()
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        self._local.count = getattr(self._local, "count", 0) + 1
+
+    def reset(self) -> int:
+        # Returns the count since the previous reset; background flushers don't add to it
+        count = getattr(self._local, "count", 0)
+        self._local.count = 0
+        return count
+
+
+def percentile(sorted_values, pct: float) -> float:
+    # Nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Recorder:
+    """Latencies, status codes and query counts per route."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.queries = defaultdict(list)
+
+    def record(self, route: str, seconds: float, status: int, queries: int | None = None):
+        self.latencies[route].append(seconds)
+        self.statuses[route][status] += 1
+        if queries is not None:
+            self.queries[route].append(queries)
+
+    def merge(self, other: dict):
+        # other is a Recorder.dump() from another process
+        for route, values in other["latencies"].items():
+            self.latencies[route].extend(values)
+        for route, counts in other["statuses"].items():
+            self.statuses[route].update({int(status): count for status, count in counts.items()})
+        for route, values in other["queries"].items():
+            self.queries[route].extend(values)
+
+    def dump(self) -> dict:
+        return {
+            "latencies": dict(self.latencies),
+            "statuses": {route: dict(counts) for route, counts in self.statuses.items()},
+            "queries": dict(self.queries),
+        }
+
+    def summary(self, wall_seconds: float | None = None) -> dict:
+        """
+        Per-route statistics, latencies in milliseconds.
+
+        Throughput is requests per second of time spent on the route, or per second
+        of wall_seconds when routes ran concurrently.
+        """
+        result = {}
+        for route, values in sorted(self.latencies.items()):
+            ordered = sorted(values)
+            elapsed = wall_seconds or sum(values)
+            queries = self.queries.get(route)
+            result[route] = {
+                "requests": len(values),
+                "throughput_rps": round(len(values) / elapsed, 2) if elapsed else 0.0,
+                "mean_ms": round(sum(values) / len(values) * 1000, 3),
+                "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+                "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+                "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+                "max_ms": round(ordered[-1] * 1000, 3),
+                "queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+                "status_codes": {str(status): count for status, count in sorted(self.statuses[route].items())},
+            }
+        return result
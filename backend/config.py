@@ -1 +1,97 @@
-DATABASE_URL = "sqlite:///BrightTimes.db"
\ No newline at end of file
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///BrightTimes.db")
+
+# Connection pool settings, used for server databases (PostgreSQL, MySQL, ...)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# SQLite connection pragmas, so several workers can share one database file
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# How often each worker pulls new revocations from token_blocklist, in seconds.
+# This bounds how long a logged-out token keeps working on other workers.
+REVOCATION_SYNC_SECONDS = float(os.getenv("REVOCATION_SYNC_SECONDS", "5"))
+
+# Join-click counters are buffered in memory and written in batches, either every
+# JOIN_FLUSH_SECONDS or once JOIN_FLUSH_MAX_PENDING clicks are waiting
+JOIN_FLUSH_SECONDS = float(os.getenv("JOIN_FLUSH_SECONDS", "2"))
+JOIN_FLUSH_MAX_PENDING = int(os.getenv("JOIN_FLUSH_MAX_PENDING", "500"))
+# Last-read totals are kept for the JOIN_COUNTS_CACHED most recently joined activities and occurrences
+JOIN_COUNTS_CACHED = int(os.getenv("JOIN_COUNTS_CACHED", "10000"))
+
+# The topic/age group facet index is updated on writes and fully rebuilt at most
+# this often, which also picks up activities that have moved into the past
+FACET_REFRESH_SECONDS = float(os.getenv("FACET_REFRESH_SECONDS", "300"))
+
+# Public activity reads are cached per route + query string. Entries are dropped
+# on writes in this worker; the TTL bounds staleness across workers
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "30"))
+
+# Password hashing runs on a dedicated, bounded worker pool so it can't starve request threads.
+# Raising PASSWORD_HASH_ITERATIONS upgrades existing hashes on the next successful login
+PASSWORD_HASH_ITERATIONS = int(os.getenv("PASSWORD_HASH_ITERATIONS", "100000"))
+PASSWORD_POOL_WORKERS = int(os.getenv("PASSWORD_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_POOL_MAX_QUEUE = int(os.getenv("PASSWORD_POOL_MAX_QUEUE", "32"))
+
+# Rate limit counters live in a small SQLite file shared by all local worker processes
+RATELIMIT_STORAGE_URI = os.getenv("RATELIMIT_STORAGE_URI", "sqlite:///ratelimits.db")
+
+# Live updates at /activities/events. Events are stored in activity_events and each worker
+# polls it every EVENTS_POLL_SECONDS while it has clients; rows older than EVENTS_RETENTION_SECONDS
+# are pruned, which bounds how far back a Last-Event-ID resume reaches. A client may fall
+# EVENTS_CLIENT_QUEUE_SIZE events behind before it is dropped; idle streams get a keep-alive
+# every EVENTS_HEARTBEAT_SECONDS.
+EVENTS_POLL_SECONDS = float(os.getenv("EVENTS_POLL_SECONDS", "1"))
+EVENTS_RETENTION_SECONDS = int(os.getenv("EVENTS_RETENTION_SECONDS", "3600"))
+EVENTS_CLIENT_QUEUE_SIZE = int(os.getenv("EVENTS_CLIENT_QUEUE_SIZE", "256"))
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+# On PostgreSQL a lower event id can commit after a higher one, so rows from the last
+# EVENTS_LAG_SECONDS are read again on every poll and the ones already sent are skipped
+EVENTS_LAG_SECONDS = float(os.getenv("EVENTS_LAG_SECONDS", "5"))
+# Every open stream holds a connection for as long as the tab is open. Async workers (gevent,
+# eventlet) hold up to EVENTS_MAX_CLIENTS each; threaded workers only EVENTS_MAX_THREADED_CLIENTS,
+# keep it well below their thread count. Sync workers refuse streams
+EVENTS_MAX_CLIENTS = int(os.getenv("EVENTS_MAX_CLIENTS", "2000"))
+EVENTS_MAX_THREADED_CLIENTS = int(os.getenv("EVENTS_MAX_THREADED_CLIENTS", "2"))
+
+# Background maintenance: every MAINTENANCE_INTERVAL_SECONDS (0 disables it) one worker moves
+# activities that started more than ARCHIVE_AFTER_DAYS ago (series: whose last occurrence did) to
+# archived_activities, prunes expired token revocations and refreshes planner statistics. Also available as `flask --app app maintenance`
+MAINTENANCE_INTERVAL_SECONDS = float(os.getenv("MAINTENANCE_INTERVAL_SECONDS", "3600"))
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "30"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+
+# Longest allowed activity. Creating, editing or importing a longer one is a 400 validation
+# error ("Duration must be more than 0 and at most ... hours"). Overlap lookups (scheduling
+# conflicts, /activities/live) range-scan the starts_at index back this far, so raising it
+# makes them read more, and lowering it below an existing activity's length hides that activity
+# from them
+MAX_ACTIVITY_HOURS = float(os.getenv("MAX_ACTIVITY_HOURS", "12"))
+
+# Calendar feeds (.ics) list activities from ICAL_PAST_DAYS ago onwards. Rendered VEVENT blocks
+# are cached per activity, up to ICAL_CACHE_MAX_EVENTS of them
+ICAL_PAST_DAYS = int(os.getenv("ICAL_PAST_DAYS", "30"))
+ICAL_CACHE_MAX_EVENTS = int(os.getenv("ICAL_CACHE_MAX_EVENTS", "50000"))
+
+# Repeating activities are expanded at query time, open-ended ones this many days ahead
+RECURRENCE_HORIZON_DAYS = int(os.getenv("RECURRENCE_HORIZON_DAYS", "180"))
+
+# Statements slower than SLOW_QUERY_MS are logged and counted. Requests running at least
+# SLOW_REQUEST_QUERIES statements are logged too, which usually points at an N+1 pattern
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_REQUEST_QUERIES = int(os.getenv("SLOW_REQUEST_QUERIES", "50"))
+
+# When set, /metrics requires "Authorization: Bearer <METRICS_TOKEN>". /metrics/slow_queries
+# always does, and is disabled while it is unset
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# Timezone used to interpret an activity's date and time when the organizer doesn't send one
+DEFAULT_TIMEZONE = os.getenv("DEFAULT_TIMEZONE", "UTC")
@@ -1,8 +1,7 @@
 from functools import wraps
 from flask import request, jsonify, current_app, g
 import jwt
-from db import SessionLocal
-from models import TokenBlocklist
+from utils.revocation import revocation_cache
 
 def token_required(f):
     @wraps(f)
@@ -20,17 +19,14 @@ def token_required(f):
                 current_app.config["SECRET_KEY"],
                 algorithms=[current_app.config["ALGORITHM"]]
             )
-            # Check if token has been revoked
-            session = SessionLocal()
+            # Check if token has been revoked (served from the in-process cache)
             jti = data.get("jti")
-            if not jti or session.query(TokenBlocklist).filter_by(jti=jti).first():
-                session.close()
+            if not jti or revocation_cache.is_revoked(jti):
                 return jsonify({"error": "Token has been revoked"}), 401
-            session.close()
 
             # Attach to global request context
             g.organizer_id = data["organizer_id"]
-            g.username = data["username"]
+            g.username = data.get("username")  # refresh tokens carry no username
         except jwt.ExpiredSignatureError:
             return jsonify({"error": "Token has expired"}), 401
         except jwt.InvalidTokenError:
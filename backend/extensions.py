@@ -1,8 +1,13 @@
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
+from config import RATELIMIT_STORAGE_URI
+from utils.metrics import record_rate_limited
+import utils.rate_limit_storage  # registers the "sqlite://" storage scheme
 
 limiter = Limiter(
     key_func=get_remote_address,
     default_limits=["200 per day", "50 per hour"],
-    storage_uri="memory://",
+    storage_uri=RATELIMIT_STORAGE_URI,
+    strategy="sliding-window-counter",
+    on_breach=record_rate_limited,
 )
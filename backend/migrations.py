@@ -0,0 +1,184 @@
+import logging
+from sqlalchemy import inspect, text, select, update, bindparam
+from sqlalchemy.schema import CreateTable
+from models import Base, Organizer, Activity, TokenBlocklist
+from db import SessionLocal
+from utils.search import ensure_search_index
+from utils.timezones import compute_schedule, utc_now
+from config import DEFAULT_TIMEZONE
+
+# Indexes replaced by later schema changes
+STALE_INDEXES = ["ix_activities_date_time_topic_age_group", "ix_activities_organizer_date_time"]
+# Tables whose ids must never be reused (see sqlite_autoincrement on the models)
+AUTOINCREMENT_TABLES = [Activity.__table__, TokenBlocklist.__table__]
+
+logger = logging.getLogger(__name__)
+
+
+def add_missing_columns(engine):
+    # create_all() never alters existing tables, so add nullable columns
+    # introduced after a table was first created
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
+
+def ensure_indexes(engine):
+    # create_all() only creates indexes together with new tables, so add
+    # indexes introduced after a table already existed
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def _release_archived_ids(connection):
+    # Activities that got the id of an archived one before AUTOINCREMENT move to fresh ids,
+    # and new ids start above every id used so far
+    last_id = connection.execute(text(
+        "SELECT MAX(id) FROM (SELECT id FROM activities UNION ALL SELECT id FROM archived_activities)"
+    )).scalar() or 0
+    reused = connection.execute(text(
+        "SELECT id FROM activities WHERE id IN (SELECT id FROM archived_activities) ORDER BY id"
+    )).scalars().all()
+    for old_id in reused:
+        last_id += 1
+        ids = {"old_id": old_id, "new_id": last_id}
+        connection.execute(text("UPDATE activity_occurrences SET activity_id = :new_id WHERE activity_id = :old_id"), ids)
+        connection.execute(text("UPDATE activities SET id = :new_id WHERE id = :old_id"), ids)
+    connection.execute(text("DELETE FROM sqlite_sequence WHERE name = 'activities'"))
+    connection.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES ('activities', :seq)"), {"seq": last_id})
+
+
+def enable_autoincrement(engine):
+    # SQLite hands out the highest deleted rowid again unless a table was created with
+    # AUTOINCREMENT, which existing tables only get by being rebuilt
+    if engine.dialect.name != "sqlite":
+        return
+    for table in AUTOINCREMENT_TABLES:
+        with engine.begin() as connection:
+            sql = connection.execute(
+                text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": table.name}
+            ).scalar()
+            if sql is None or "AUTOINCREMENT" in sql.upper():
+                continue
+            if table is Activity.__table__:
+                # Its triggers are dropped with the old table, ensure_search_index rebuilds the index
+                connection.execute(text("DROP TABLE IF EXISTS activities_fts"))
+            rebuilt = f"{table.name}_rebuilt"
+            create = str(CreateTable(table).compile(dialect=engine.dialect))
+            connection.execute(text(create.replace(f"CREATE TABLE {table.name} ", f"CREATE TABLE {rebuilt} ", 1)))
+            columns = ", ".join(f'"{column.name}"' for column in table.columns)
+            connection.execute(text(f"INSERT INTO {rebuilt} ({columns}) SELECT {columns} FROM {table.name}"))
+            connection.execute(text(f"DROP TABLE {table.name}"))
+            connection.execute(text(f"ALTER TABLE {rebuilt} RENAME TO {table.name}"))
+            if table is Activity.__table__:
+                _release_archived_ids(connection)
+
+
+def drop_stale_indexes(engine):
+    with engine.begin() as connection:
+        for name in STALE_INDEXES:
+            connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+def backfill_activity_schedule(engine):
+    # Derive starts_at/ends_at for activities created before they existed,
+    # reading their date/time in DEFAULT_TIMEZONE
+    table = Activity.__table__
+    with engine.begin() as connection:
+        rows = connection.execute(
+            select(table.c.id, table.c.date, table.c.time, table.c.duration, table.c.timezone)
+            .where(table.c.starts_at.is_(None))
+        ).all()
+
+        updates = []
+        for row in rows:
+            try:
+                starts_at, ends_at = compute_schedule(row.date, row.time, row.duration, row.timezone)
+            except (TypeError, ValueError):
+                continue  # unparseable legacy time, left out of upcoming/past queries
+            updates.append({
+                "b_id": row.id,
+                "b_timezone": row.timezone or DEFAULT_TIMEZONE,
+                "b_starts_at": starts_at,
+                "b_ends_at": ends_at,
+            })
+
+        if updates:
+            connection.execute(
+                update(table)
+                .where(table.c.id == bindparam("b_id"))
+                .values(
+                    timezone=bindparam("b_timezone"),
+                    starts_at=bindparam("b_starts_at"),
+                    ends_at=bindparam("b_ends_at"),
+                ),
+                updates,
+            )
+
+
+def enable_incremental_vacuum(engine):
+    # Lets maintenance hand freed pages back with PRAGMA incremental_vacuum. An existing
+    # SQLite database only switches auto_vacuum mode with a full VACUUM, run once
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        if connection.execute(text("PRAGMA auto_vacuum")).scalar() == 2:
+            return
+        connection.execute(text("PRAGMA auto_vacuum=INCREMENTAL"))
+        connection.execute(text("VACUUM"))
+
+
+def backfill_updated_at(engine):
+    # Activities from before updated_at existed count as changed now
+    table = Activity.__table__
+    with engine.begin() as connection:
+        connection.execute(update(table).where(table.c.updated_at.is_(None)).values(updated_at=utc_now()))
+
+
+def migrate_legacy_avatars():
+    # Move inline base64 avatars into the content-addressed avatar store. Ones that can't be
+    # converted (e.g. SVG data URLs) stay in avatar_base64 until the organizer uploads a new one
+    from utils.avatars import store_avatar
+
+    failed = 0
+    with SessionLocal() as session:
+        organizers = session.query(Organizer).filter(Organizer.avatar_base64.isnot(None)).all()
+        for organizer in organizers:
+            try:
+                organizer.avatar_hash = store_avatar(session, organizer.avatar_base64)
+            except ValueError:
+                failed += 1
+                continue
+            organizer.avatar_base64 = None
+            session.flush()
+        session.commit()
+    if failed:
+        logger.warning("%d legacy avatars could not be converted and were kept in organizers.avatar_base64", failed)
+
+
+def run_migrations(engine):
+    """
+    Create missing tables and apply every schema change and backfill, in order.
+
+    Not safe to run from several processes at once (table rebuilds, VACUUM), so it runs
+    once per deploy through `flask --app app migrate`, never at import time.
+    """
+    Base.metadata.create_all(bind=engine)
+    add_missing_columns(engine)
+    enable_autoincrement(engine)
+    drop_stale_indexes(engine)
+    ensure_indexes(engine)
+    backfill_activity_schedule(engine)
+    backfill_updated_at(engine)
+    ensure_search_index(engine)
+    migrate_legacy_avatars()
+    enable_incremental_vacuum(engine)
@@ -1,34 +1,40 @@
-from sqlalchemy import Column, Integer, String, Date, ForeignKey, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import Boolean, Column, Integer, String, Date, DateTime, ForeignKey, Text, Index, LargeBinary, text
+from sqlalchemy.orm import joinedload, load_only, relationship
 from db import Base
 from datetime import date
-from sqlalchemy.ext.declarative import declared_attr
+from utils.serializers import Serializer, as_http_date
+from utils.timezones import to_zone
 
 class TokenBlocklist(Base):
     __tablename__ = "token_blocklist"
+    __table_args__ = {"sqlite_autoincrement": True}  # workers pull new revocations by id, which must only grow
     id = Column(Integer, primary_key=True)
     jti = Column(String, nullable=False, index=True)
     created_at = Column(Date, default=date.today)
+    expires_at = Column(DateTime, nullable=True, index=True)  # token exp (UTC), revocation can be forgotten after it
 
-class SerializableMixin:
-    @declared_attr
-    def __tablename__(cls):
-        return cls.__name__.lower()
-    
-    def as_dict(self, include_relationships=False):
-        data = {c.name: getattr(self, c.name) for c in self.__table__.columns}
-        if include_relationships:
-            for attr in self.__mapper__.relationships.keys():
-                related = getattr(self, attr)
-                if related is None:
-                    data[attr] = None
-                elif isinstance(related, list):
-                    data[attr] = [item.as_dict() for item in related]
-                else:
-                    data[attr] = related.as_dict()
-        return data
+class AvatarImage(Base):
+    __tablename__ = "avatar_images"
+    hash = Column(String(64), primary_key=True)  # sha256 of the original image bytes
+    mime_type = Column(String, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+    thumbnail = Column(LargeBinary, nullable=True)  # small PNG rendered on upload
+    created_at = Column(Date, default=date.today)
+
+class OrganizerStats(Base):
+    __tablename__ = "organizer_stats"
+    # Running totals, updated on activity writes and join flushes
+    organizer_id = Column(Integer, ForeignKey("organizers.id"), primary_key=True)
+    total_activities = Column(Integer, nullable=False, default=0)
+    total_times_join_pressed = Column(Integer, nullable=False, default=0)
+
+class OrganizerTopicCount(Base):
+    __tablename__ = "organizer_topic_counts"
+    organizer_id = Column(Integer, ForeignKey("organizers.id"), primary_key=True)
+    topic = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
 
-class Activity(Base, SerializableMixin):
+class Activity(Base):
     __tablename__ = "activities"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -38,23 +44,134 @@ class Activity(Base, SerializableMixin):
     age_group = Column(String, nullable=False)
     date = Column(Date, nullable=False)
     time = Column(String, nullable=False)
+    timezone = Column(String, nullable=True)  # IANA zone the organizer entered date/time in
+    starts_at = Column(DateTime, nullable=True)  # UTC, derived from date + time + timezone
+    ends_at = Column(DateTime, nullable=True)  # UTC, starts_at + duration
     join_link = Column(String, nullable=False)
     duration = Column(Integer, nullable=False) # saved in hours:minutes
     materials = Column(Text, nullable=True)  # save materials as string separated by commas
+    # Repeating activities: an RRULE subset, e.g. "FREQ=WEEKLY;BYDAY=MO,WE;COUNT=15". For a series,
+    # date/time is the first possible occurrence and starts_at/ends_at the first actual one
+    recurrence = Column(String, nullable=True)
+    recurrence_ends_at = Column(DateTime, nullable=True)  # UTC start of the last occurrence, None if open-ended
     
     total_times_join_pressed = Column(Integer, default=0)
+    # UTC, bumped by every organizer change (not by joins); calendar feeds cache and validate on it
+    updated_at = Column(DateTime, nullable=True)
     
     organizer_id = Column(Integer, ForeignKey("organizers.id"), nullable=False)
     organizer = relationship("Organizer", back_populates="activities")
 
-    def as_dict(self, include_relationships=False):
-        data = super().as_dict(include_relationships)
-        if 'password_hash' in data['organizer']:
-            del data['organizer']['password_hash']
+    __table_args__ = (
+        # Serves the upcoming-activities listing: range scan on starts_at, filter on topic/age group
+        Index("ix_activities_starts_at_topic_age_group", "starts_at", "topic", "age_group"),
+        # Serves an organizer's own listing, newest first
+        Index("ix_activities_organizer_starts_at", "organizer_id", "starts_at"),
+        # Only series, which listings load separately and expand in memory
+        Index(
+            "ix_activities_series", "recurrence_ends_at",
+            sqlite_where=text("recurrence IS NOT NULL"), postgresql_where=text("recurrence IS NOT NULL"),
+        ),
+        # Ids live on in archived_activities, feed UIDs and cache tags, so SQLite must never reuse them
+        {"sqlite_autoincrement": True},
+    )
+
+    def as_dict(self, include_relationships=False, tz=None, occurrence=None, fields=None):
+        # fields is a ?fields= projection (see ACTIVITY_FIELDS), None for everything
+        only = fields
+        if not include_relationships:
+            only = (fields or ACTIVITY_SERIALIZER.keys) - {"organizer"}
+        data = ACTIVITY_SERIALIZER(self, tz, only)
+        if occurrence is not None and occurrence.original_start is not None:
+            # One occurrence of a series; occurrenceStart (UTC) identifies it for joins and exceptions
+            overrides = {
+                'date': as_http_date(occurrence.local_date),
+                'time': occurrence.local_time,
+                'startsAt': to_zone(occurrence.starts_at, tz),
+                'endsAt': to_zone(occurrence.ends_at, tz),
+                'occurrenceStart': to_zone(occurrence.original_start, None),
+                'total_times_join_pressed': occurrence.joins,
+            }
+            data.update(overrides if fields is None else {k: v for k, v in overrides.items() if k in fields})
         return data
 
+    @classmethod
+    def load_options(cls, fields=None) -> list:
+        """Query options for a ?fields= projection: only the columns it needs, and the organizer only if asked for."""
+        if fields is None:
+            # Load organizers in the same query instead of one SELECT per activity
+            return [joinedload(cls.organizer)]
+        columns = ACTIVITY_SCHEDULE_COLUMNS + [ACTIVITY_PROJECTED_COLUMNS[f] for f in fields if f in ACTIVITY_PROJECTED_COLUMNS]
+        options = [load_only(*(getattr(cls, column) for column in columns))]
+        if "organizer" in fields:
+            options.append(joinedload(cls.organizer))
+        return options
+
+
+class ActivityOccurrence(Base):
+    """Per-occurrence state of a series: cancellations, moves and join counts. Rows exist only when needed."""
+    __tablename__ = "activity_occurrences"
+
+    activity_id = Column(Integer, ForeignKey("activities.id"), primary_key=True)
+    original_start = Column(DateTime, primary_key=True)  # UTC start the rule produces
+    cancelled = Column(Boolean, nullable=False, default=False)
+    starts_at = Column(DateTime, nullable=True)  # UTC, set when the occurrence was moved
+    ends_at = Column(DateTime, nullable=True)
+    total_times_join_pressed = Column(Integer, nullable=False, default=0)
+
 
-class Organizer(Base, SerializableMixin):
+class ArchivedActivity(Base):
+    """Activities moved out of the activities table by the archiver, kept for organizer history."""
+    __tablename__ = "archived_activities"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)  # the activity's original id
+    title = Column(String, nullable=False)
+    description = Column(String, nullable=False)
+    topic = Column(String, nullable=False)
+    age_group = Column(String, nullable=False)
+    date = Column(Date, nullable=False)
+    time = Column(String, nullable=False)
+    timezone = Column(String, nullable=True)
+    starts_at = Column(DateTime, nullable=True)
+    ends_at = Column(DateTime, nullable=True)
+    join_link = Column(String, nullable=False)
+    duration = Column(Integer, nullable=False)
+    materials = Column(Text, nullable=True)
+    recurrence = Column(String, nullable=True)
+    recurrence_ends_at = Column(DateTime, nullable=True)
+    total_times_join_pressed = Column(Integer, default=0)
+    updated_at = Column(DateTime, nullable=True)
+    organizer_id = Column(Integer, ForeignKey("organizers.id"), nullable=False)
+    archived_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_archived_activities_organizer_starts_at", "organizer_id", "starts_at"),
+    )
+
+    def as_dict(self, tz=None, fields=None):
+        return ARCHIVED_ACTIVITY_SERIALIZER(self, tz, fields)
+
+
+class ActivityEvent(Base):
+    """Live-update events, read by every worker that streams /activities/events."""
+    __tablename__ = "activity_events"
+    __table_args__ = {"sqlite_autoincrement": True}  # ids are the stream's event ids, never reused
+
+    id = Column(Integer, primary_key=True)
+    event = Column(String, nullable=False)
+    data = Column(Text, nullable=False)  # JSON
+    created_at = Column(DateTime, nullable=False, index=True)
+
+
+class MaintenanceRun(Base):
+    """When each maintenance job last ran, so only one worker runs it per interval."""
+    __tablename__ = "maintenance_runs"
+
+    name = Column(String, primary_key=True)
+    last_run_at = Column(DateTime, nullable=True)
+
+
+class Organizer(Base):
     __tablename__ = "organizers"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -63,14 +180,63 @@ class Organizer(Base, SerializableMixin):
 
     name = Column(String, nullable=True)
     bio = Column(Text, nullable=True)
-    avatar_base64 = Column(Text, nullable=True)  # Store base64-encoded image
+    avatar_base64 = Column(Text, nullable=True)  # Legacy inline avatar, kept only if migrations couldn't convert it
+    avatar_hash = Column(String(64), ForeignKey("avatar_images.hash"), nullable=True)
     joined_date = Column(Date, nullable=True, default=date.today)
 
     activities = relationship("Activity", back_populates="organizer", cascade="all, delete-orphan")
 
-    def as_dict(self, include_relationships=False):
-        data = super().as_dict(include_relationships)
-        if 'password_hash' in data:
-            del data['password_hash']
-        return data
+    def as_dict(self):
+        return ORGANIZER_SERIALIZER(self)
+
+
+# Serializers are compiled here once; the password hash and legacy inline avatar are never listed.
+# Avatars ship as URLs to the content-addressed image instead of the image itself
+ORGANIZER_SERIALIZER = Serializer([
+    ("id", "id", None),
+    ("username", "username", None),
+    ("name", "name", None),
+    ("bio", "bio", None),
+    ("joined_date", "joined_date", as_http_date),
+    ("avatar_url", "avatar_hash", lambda value, tz: f"/avatars/{value}" if value else None),
+    ("avatar_thumbnail_url", "avatar_hash", lambda value, tz: f"/avatars/{value}/thumbnail" if value else None),
+])
+
+# Timestamps are ISO 8601, in the caller's timezone when one is given
+_ACTIVITY_FIELDS = [
+    ("id", "id", None),
+    ("title", "title", None),
+    ("description", "description", None),
+    ("topic", "topic", None),
+    ("age_group", "age_group", None),
+    ("date", "date", as_http_date),
+    ("time", "time", None),
+    ("timezone", "timezone", None),
+    ("startsAt", "starts_at", to_zone),
+    ("endsAt", "ends_at", to_zone),
+    ("duration", "duration", None),
+    ("join_link", "join_link", None),
+    ("materials", "materials", None),
+    ("recurrence", "recurrence", None),
+    ("recurrenceEndsAt", "recurrence_ends_at", to_zone),
+    ("total_times_join_pressed", "total_times_join_pressed", None),
+    ("organizer_id", "organizer_id", None),
+]
+ACTIVITY_SERIALIZER = Serializer(_ACTIVITY_FIELDS + [
+    ("organizer", "organizer", lambda organizer, tz: ORGANIZER_SERIALIZER(organizer) if organizer is not None else None),
+])
+ARCHIVED_ACTIVITY_SERIALIZER = Serializer(_ACTIVITY_FIELDS + [("archivedAt", "archived_at", to_zone)])
+
+# Keys a ?fields= projection may ask for
+ACTIVITY_FIELDS = ACTIVITY_SERIALIZER.keys | {"occurrenceStart"}
+ARCHIVED_ACTIVITY_FIELDS = ARCHIVED_ACTIVITY_SERIALIZER.keys
+
+# Columns always loaded for listings (scheduling, series expansion, cache tags), and the rest by key
+ACTIVITY_SCHEDULE_COLUMNS = [
+    "id", "organizer_id", "date", "time", "timezone", "duration", "starts_at", "ends_at",
+    "recurrence", "recurrence_ends_at", "total_times_join_pressed",
+]
+ACTIVITY_PROJECTED_COLUMNS = {
+    key: attribute for key, attribute, _ in _ACTIVITY_FIELDS if attribute not in ACTIVITY_SCHEDULE_COLUMNS
+}
     
@@ -1,18 +1,53 @@
-from flask import Blueprint, jsonify, request
-from models import Activity, Organizer
-from db import SessionLocal
-from datetime import datetime
+from flask import Blueprint, Response, jsonify, request
+from models import ACTIVITY_FIELDS, ACTIVITY_SERIALIZER, Activity, Organizer
+from db import get_session
+from extensions import limiter
+from datetime import datetime, timedelta
+from itertools import islice
+from utils.events import event_broker, stream_capacity
+from utils.facets import facet_index
+from utils.intervals import overlapping
+from utils.join_counter import join_counter
+from utils.recurrence import (
+    find_occurrence, horizon, parse_occurrence, upcoming_clause, upcoming_occurrences, with_next_occurrences,
+)
+from utils.response_cache import cached_response, activity_tags, activity_list_tags
+from utils.search import apply_search
+from utils.serializers import parse_fields
+from utils.timezones import request_timezone, utc_now
+from utils.pagination import parse_limit, encode_cursor, decode_cursor
+from utils.streaming import stream_ndjson, wants_stream
 
 activity_routes_blueprint = Blueprint("api", __name__)
 
+LIVE_WINDOW_MINUTES = 30
+MAX_LIVE_WINDOW_MINUTES = 24 * 60
+
 @activity_routes_blueprint.route("/activities", methods=["GET"])
+@cached_response(activity_list_tags)
 def get_activities():
-    session = SessionLocal()
-
     topic = request.args.get("topic")
     age_group = request.args.get("age_group")
+    q = request.args.get("q", "").strip()
+    cursor = request.args.get("cursor")
+    paginated = "limit" in request.args or cursor is not None
+
+    try:
+        limit = parse_limit(request.args.get("limit"))
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        return jsonify({"error": "Invalid limit or cursor"}), 400
 
-    query = session.query(Activity)
+    try:
+        tz = request_timezone()
+        fields = parse_fields(request.args.get("fields"), ACTIVITY_FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    session = get_session()
+    now = utc_now()
+
+    query = session.query(Activity).options(*Activity.load_options(fields))
 
     if topic and topic != "All Topics":
         query = query.filter(Activity.topic == topic)
@@ -20,72 +55,195 @@ def get_activities():
     if age_group and age_group != "All Ages":
         query = query.filter(Activity.age_group == age_group)
 
-    # check if the activity date and time is in the past
-    today = datetime.now().date()
-    current_time = datetime.now().time()
-    query = query.filter(
-        (Activity.date > today) | 
-        ((Activity.date == today) & (Activity.time >= current_time))
-    )
-    activities = query.all()
+    def serialize(occurrence):
+        return occurrence.activity.as_dict(include_relationships=True, tz=tz, occurrence=occurrence, fields=fields)
+
+    if q:
+        # Full-text search, ranked by relevance; a series is listed once, at its next occurrence
+        query = apply_search(query.filter(upcoming_clause(now)), q)
+        if wants_stream():
+            return stream_ndjson(with_next_occurrences(session, query.yield_per(200), now), serialize)
+        if not paginated:
+            return jsonify([serialize(o) for o in with_next_occurrences(session, query.all(), now)])
+
+        # Ranked results page by offset, the cursor holds the next one
+        try:
+            offset = int(after[0]) if after else 0
+        except (IndexError, TypeError, ValueError):
+            return jsonify({"error": "Invalid limit or cursor"}), 400
+        activities = query.offset(offset).limit(limit + 1).all()
+        has_more = len(activities) > limit
+        result = [serialize(o) for o in with_next_occurrences(session, activities[:limit], now)]
+        next_cursor = encode_cursor([offset + limit]) if has_more else None
+        return jsonify({"activities": result, "nextCursor": next_cursor})
+
+    if after:
+        try:
+            after = (datetime.fromisoformat(after[0]), int(after[1]))
+        except (IndexError, TypeError, ValueError):
+            return jsonify({"error": "Invalid limit or cursor"}), 400
+
+    # Upcoming occurrences by start time (id breaks ties so the keyset is unique);
+    # series are expanded here, up to the recurrence horizon
+    occurrences = upcoming_occurrences(session, query, now, horizon(now), after)
+
+    if wants_stream():
+        # The whole result set, serialized row by row as it is read
+        return stream_ndjson(occurrences, serialize)
+
+    if not paginated:
+        return jsonify([serialize(o) for o in occurrences])
+
+    page = list(islice(occurrences, limit + 1))
+    result = [serialize(o) for o in page[:limit]]
+    next_cursor = None
+    if len(page) > limit:
+        last = page[limit - 1]
+        next_cursor = encode_cursor([last.starts_at.isoformat(), last.activity.id])
+
+    return jsonify({"activities": result, "nextCursor": next_cursor})
+
+
+@activity_routes_blueprint.route("/activities/live", methods=["GET"])
+@cached_response(activity_list_tags)
+def get_live_activities():
+    # What is on at `at` (default now) or starts within the next `within` minutes (default 30)
+    try:
+        at = parse_occurrence(request.args["at"]) if "at" in request.args else utc_now()
+        within = int(request.args.get("within", LIVE_WINDOW_MINUTES))
+        tz = request_timezone()
+        fields = parse_fields(request.args.get("fields"), ACTIVITY_FIELDS | {"isLive"})
+    except ValueError:
+        return jsonify({"error": "Invalid at, within, timezone or fields"}), 400
+    if not 0 <= within <= MAX_LIVE_WINDOW_MINUTES:
+        return jsonify({"error": f"within must be between 0 and {MAX_LIVE_WINDOW_MINUTES} minutes"}), 400
+
+    session = get_session()
+    query = session.query(Activity).options(*Activity.load_options(fields))
+    topic = request.args.get("topic")
+    if topic and topic != "All Topics":
+        query = query.filter(Activity.topic == topic)
+    age_group = request.args.get("age_group")
+    if age_group and age_group != "All Ages":
+        query = query.filter(Activity.age_group == age_group)
 
-    result = [
-        a.as_dict(include_relationships=True) for a in activities
-    ]
+    # The window includes activities starting exactly at its end
+    window_end = at + timedelta(minutes=within, microseconds=1)
+    result = []
+    for occurrence in overlapping(session, query, at, window_end):
+        data = occurrence.activity.as_dict(include_relationships=True, tz=tz, occurrence=occurrence, fields=fields)
+        if fields is None or "isLive" in fields:
+            data["isLive"] = occurrence.starts_at <= at
+        result.append(data)
+    return jsonify(result)
 
-    # Sort activities by date and time
-    result.sort(key=lambda x: (x["date"], x["time"]))
 
-    session.close()
-    return jsonify(result)
+@activity_routes_blueprint.route("/activities/events", methods=["GET"])
+@limiter.exempt
+def activity_events():
+    # Server-Sent Events: activity.created/updated/deleted, occurrence.updated, activities.imported, joins and reset
+    capacity = stream_capacity(request.environ)
+    if capacity == 0:
+        return jsonify({"error": "Live updates need a threaded or async server worker"}), 503
+    subscription = event_broker.subscribe(
+        request.headers.get("Last-Event-ID") or request.args.get("lastEventId"), capacity,
+    )
+    if subscription is None:
+        return jsonify({"error": "Too many open event streams"}), 503
+
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            yield from subscription
+        finally:
+            subscription.close()
+
+    return Response(generate(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # keep reverse proxies from buffering the stream
+    })
 
 
 @activity_routes_blueprint.route("/activities/<int:activity_id>/join", methods=["POST"])
 def join_activity(activity_id):
-    with SessionLocal() as session:
-        activity = session.query(Activity).filter_by(id=activity_id).first()
-        if not activity:
-            return jsonify({"error": "Activity not found"}), 404
-        activity.total_times_join_pressed += 1
-        session.commit()
-        return jsonify({"message": "Successfully joined the activity", "totalTimesJoinPressed": activity.total_times_join_pressed})
+    # Occurrences of a series are counted separately, identified by their original start
+    occurrence = request.args.get("occurrence") or (request.get_json(silent=True) or {}).get("occurrence")
+    try:
+        occurrence = parse_occurrence(occurrence) if occurrence else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid occurrence"}), 400
+
+    # Clicks are buffered and written in batches, the returned count is approximate
+    total = join_counter.record(activity_id, occurrence)
+    if total is None:
+        return jsonify({"error": "Activity not found"}), 404
+    return jsonify({"message": "Successfully joined the activity", "totalTimesJoinPressed": total})
 
 
 @activity_routes_blueprint.route("/activities/age_groups", methods=["GET"])
 def get_age_groups():
-    session = SessionLocal()
-    age_groups = session.query(Activity.age_group).distinct().all()
-    session.close()
-
-    age_group_list = [age_group[0] for age_group in age_groups]
-    return jsonify(age_group_list)
+    return jsonify(facet_index.values("age_group"))
 
 
 @activity_routes_blueprint.route("/activities/topics", methods=["GET"])
 def get_topics():
-    session = SessionLocal()
-    topics = session.query(Activity.topic).distinct().all()
-    session.close()
+    return jsonify(facet_index.values("topic"))
+
 
-    topic_list = [topic[0] for topic in topics]
-    return jsonify(topic_list)
+@activity_routes_blueprint.route("/activities/facets", methods=["GET"])
+def get_facets():
+    # Counts of upcoming activities per topic and age group
+    return jsonify({
+        "topics": facet_index.upcoming_counts("topic"),
+        "ageGroups": facet_index.upcoming_counts("age_group"),
+    })
 
 
 @activity_routes_blueprint.route("/activities/<int:activity_id>", methods=["GET"])
+@cached_response(lambda payload, activity_id: activity_tags(payload) | {f"activity:{activity_id}"})
 def get_activity(activity_id):
-    with SessionLocal() as session:
-        activity = session.query(Activity).filter_by(id=activity_id).first()
-        if not activity:
-            return jsonify({"error": "Activity not found"}), 404
-        data = activity.as_dict(include_relationships=True)
-        return jsonify(data), 200
+    try:
+        tz = request_timezone()
+        fields = parse_fields(request.args.get("fields"), ACTIVITY_FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    session = get_session()
+    activity = session.query(Activity).options(*Activity.load_options(fields)).filter_by(id=activity_id).first()
+    if not activity:
+        return jsonify({"error": "Activity not found"}), 404
+
+    # ?occurrence=<original start> renders one occurrence of a series
+    occurrence = None
+    if request.args.get("occurrence"):
+        try:
+            occurrence = find_occurrence(session, activity, parse_occurrence(request.args["occurrence"]))
+        except ValueError:
+            return jsonify({"error": "Invalid occurrence"}), 400
+        if occurrence is None:
+            return jsonify({"error": "Occurrence not found"}), 404
+    data = activity.as_dict(include_relationships=True, tz=tz, occurrence=occurrence, fields=fields)
+    return jsonify(data), 200
 
 
 @activity_routes_blueprint.route("/activities/organizer/<int:organizer_id>", methods=["GET"])
+@cached_response(lambda payload, organizer_id: {f"organizer:{organizer_id}"})
 def get_organizer_activities(organizer_id):
-    with SessionLocal() as session:
-        activities = session.query(Activity).filter_by(organizer_id=organizer_id).all()
-        if not activities:
+    try:
+        tz = request_timezone()
+        fields = parse_fields(request.args.get("fields"), ACTIVITY_SERIALIZER.keys)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    session = get_session()
+    query = session.query(Activity).options(*Activity.load_options(fields)).filter_by(organizer_id=organizer_id)
+    if wants_stream():
+        if not session.query(query.exists()).scalar():
             return jsonify({"error": "No activities found for this organizer"}), 404
-        result = [a.as_dict(include_relationships=True) for a in activities]
-        return jsonify(result), 200
\ No newline at end of file
+        return stream_ndjson(query, lambda a: a.as_dict(include_relationships=True, tz=tz, fields=fields))
+
+    activities = query.all()
+    if not activities:
+        return jsonify({"error": "No activities found for this organizer"}), 404
+    result = [a.as_dict(include_relationships=True, tz=tz, fields=fields) for a in activities]
+    return jsonify(result), 200
\ No newline at end of file
@@ -1,12 +1,13 @@
 from flask import Blueprint, jsonify, request, current_app
 from models import Organizer, TokenBlocklist
-from db import SessionLocal
+from db import get_session
 import datetime
 import jwt
 import uuid
-from utils.security import verify_password  # your hashlib-based verifier
+from utils.security import verify_password, hash_password, needs_rehash, PasswordPoolBusy
 from extensions import limiter
 from decorators import token_required
+from utils.revocation import revocation_cache
 
 auth_routes_blueprint = Blueprint("auth", __name__)
 
@@ -20,12 +21,22 @@ def login():
     if not username or not password:
         return jsonify({"error": "Username and password are required"}), 400
 
-    session = SessionLocal()
+    session = get_session()
     organizer = session.query(Organizer).filter_by(username=username).first()
 
-    if not organizer or not verify_password(organizer.password_hash, password):
-        session.close()
-        return jsonify({"error": "Invalid credentials"}), 401
+    try:
+        if not organizer or not verify_password(organizer.password_hash, password):
+            return jsonify({"error": "Invalid credentials"}), 401
+    except PasswordPoolBusy:
+        return jsonify({"error": "Server is busy, please try again"}), 503, {"Retry-After": "1"}
+
+    # Transparently upgrade hashes made with older parameters
+    if needs_rehash(organizer.password_hash):
+        try:
+            organizer.password_hash = hash_password(password)
+            session.commit()
+        except PasswordPoolBusy:
+            pass  # keep the old hash, it is upgraded on a later login
 
     # Create access token
     access_payload = {
@@ -46,7 +57,6 @@ def login():
     }
     refresh_token = jwt.encode(refresh_payload, current_app.config["SECRET_KEY"], algorithm=current_app.config["ALGORITHM"])
 
-    session.close()
     return jsonify({"access_token": access_token, "refresh_token": refresh_token, "username": organizer.username})
 
 
@@ -92,10 +102,11 @@ def logout():
         )
         jti = data.get("jti")
         if jti:
-            session = SessionLocal()
-            session.add(TokenBlocklist(jti=jti))
+            expires_at = datetime.datetime.fromtimestamp(data["exp"], datetime.timezone.utc) if "exp" in data else None
+            session = get_session()
+            session.add(TokenBlocklist(jti=jti, expires_at=expires_at.replace(tzinfo=None) if expires_at else None))
             session.commit()
-            session.close()
+            revocation_cache.revoke(jti, data.get("exp"))
         return jsonify({"message": "Successfully logged out"}), 200
     except jwt.ExpiredSignatureError:
         return jsonify({"error": "Token has expired"}), 401
@@ -0,0 +1,51 @@
+from flask import Blueprint, jsonify, request, make_response
+from models import AvatarImage
+from db import get_session
+from utils.avatars import avatar_cache
+
+avatar_routes_blueprint = Blueprint("avatars", __name__)
+
+# Avatars are content-addressed, so a URL always refers to the same bytes
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def _load_avatar(content_hash, thumbnail):
+    key = (content_hash, thumbnail)
+    entry = avatar_cache.get(key)
+    if entry is None:
+        image = get_session().get(AvatarImage, content_hash)
+        if not image:
+            return None
+        if thumbnail and image.thumbnail:
+            entry = ("image/png", image.thumbnail)
+        else:
+            entry = (image.mime_type, image.data)
+        avatar_cache.put(key, entry)
+    return entry
+
+
+def _avatar_response(content_hash, thumbnail=False):
+    etag = f"{content_hash}-thumb" if thumbnail else content_hash
+    if etag in request.if_none_match:
+        response = make_response("", 304)
+    else:
+        entry = _load_avatar(content_hash, thumbnail)
+        if entry is None:
+            return jsonify({"error": "Avatar not found"}), 404
+        mime_type, data = entry
+        response = make_response(data)
+        response.headers["Content-Type"] = mime_type
+
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return response
+
+
+@avatar_routes_blueprint.route("/avatars/<string:content_hash>", methods=["GET"])
+def get_avatar(content_hash):
+    return _avatar_response(content_hash)
+
+
+@avatar_routes_blueprint.route("/avatars/<string:content_hash>/thumbnail", methods=["GET"])
+def get_avatar_thumbnail(content_hash):
+    return _avatar_response(content_hash, thumbnail=True)
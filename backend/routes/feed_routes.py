@@ -0,0 +1,115 @@
+from datetime import timedelta, timezone
+from flask import Blueprint, Response, jsonify, make_response, request, stream_with_context
+from sqlalchemy import func
+from models import Activity, Organizer
+from db import get_session
+from utils.ical import (
+    CALENDAR_FOOTER, ICAL_MIMETYPE, calendar_header, feed_etag, render_vevent, vevent_cache, vtimezone,
+)
+from utils.recurrence import horizon, load_exceptions, upcoming_clause
+from utils.timezones import resolve_timezone, utc_now
+from config import ICAL_PAST_DAYS
+
+feed_routes_blueprint = Blueprint("feeds", __name__)
+
+RENDER_BATCH_SIZE = 200
+
+
+def _timezones(query, now) -> str:
+    # Series are written in their own zone (TZID), each one used needs a VTIMEZONE covering
+    # its series from the earliest start to the last occurrence or the expansion horizon
+    spans = {}
+    for zone, first, last in (
+        query.filter(Activity.recurrence.isnot(None))
+        .with_entities(Activity.timezone, func.min(Activity.starts_at), func.max(Activity.recurrence_ends_at))
+        .group_by(Activity.timezone)
+    ):
+        if first is None:
+            continue  # only legacy rows without a parseable time
+        key = resolve_timezone(zone).key
+        last = max(last or now, horizon(now))
+        if key in spans:
+            first, last = min(first, spans[key][0]), max(last, spans[key][1])
+        spans[key] = (first, last)
+    return "".join(
+        vtimezone(key, first.date() - timedelta(days=1), last.date() + timedelta(days=2))
+        for key, (first, last) in sorted(spans.items())
+    )
+
+
+def _render(session, query, name, rows, now):
+    yield calendar_header(name)
+    yield _timezones(query, now)
+    for start in range(0, len(rows), RENDER_BATCH_SIZE):
+        batch = rows[start:start + RENDER_BATCH_SIZE]
+        blocks = {activity_id: vevent_cache.get(activity_id, updated_at) for activity_id, updated_at in batch}
+        missing = [activity_id for activity_id, block in blocks.items() if block is None]
+        if missing:
+            activities = session.query(Activity).filter(Activity.id.in_(missing)).all()
+            exceptions = load_exceptions(session, [a.id for a in activities if a.recurrence])
+            for activity in activities:
+                block = blocks[activity.id] = render_vevent(activity, exceptions.get(activity.id))
+                vevent_cache.put(activity.id, activity.updated_at, block)
+        # Activities deleted since the listing query are left out
+        yield "".join(blocks[activity_id] or "" for activity_id, _ in batch)
+    yield CALENDAR_FOOTER
+
+
+def _feed(session, query, name):
+    # Every poll runs one narrow (id, updated_at) query; an unchanged feed ends there with a 304
+    now = utc_now()
+    since = now - timedelta(days=ICAL_PAST_DAYS)
+    query = query.filter(upcoming_clause(since))
+    rows = (
+        query
+        .with_entities(Activity.id, Activity.updated_at)
+        .order_by(Activity.starts_at, Activity.id)
+        .all()
+    )
+    etag = feed_etag(name, rows)
+    last_modified = max((updated_at for _, updated_at in rows if updated_at), default=None)
+    if last_modified is not None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc, microsecond=0)
+
+    if request.if_none_match:
+        not_modified = etag in request.if_none_match
+    else:
+        not_modified = (
+            last_modified is not None and request.if_modified_since is not None
+            and last_modified <= request.if_modified_since
+        )
+
+    if not_modified:
+        response = make_response("", 304)
+    else:
+        response = Response(stream_with_context(_render(session, query, name, rows, now)), mimetype=ICAL_MIMETYPE)
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+@feed_routes_blueprint.route("/activities/feed.ics", methods=["GET"])
+def activities_feed():
+    session = get_session()
+    query = session.query(Activity)
+    name = "BrightTimes"
+    topic = request.args.get("topic")
+    if topic and topic != "All Topics":
+        query = query.filter(Activity.topic == topic)
+        name += f" – {topic}"
+    age_group = request.args.get("age_group")
+    if age_group and age_group != "All Ages":
+        query = query.filter(Activity.age_group == age_group)
+        name += f" – {age_group}"
+    return _feed(session, query, name)
+
+
+@feed_routes_blueprint.route("/activities/organizer/<int:organizer_id>/feed.ics", methods=["GET"])
+def organizer_feed(organizer_id):
+    session = get_session()
+    organizer = session.query(Organizer.name, Organizer.username).filter_by(id=organizer_id).first()
+    if organizer is None:
+        return jsonify({"error": "Organizer not found"}), 404
+    query = session.query(Activity).filter_by(organizer_id=organizer_id)
+    return _feed(session, query, f"BrightTimes – {organizer.name or organizer.username}")
@@ -0,0 +1,27 @@
+from flask import Blueprint, Response, jsonify, request
+from config import METRICS_TOKEN
+from utils.metrics import metrics, slow_queries
+
+metrics_routes_blueprint = Blueprint("metrics", __name__)
+
+
+def _authorized(required=False) -> bool:
+    if not METRICS_TOKEN:
+        return not required
+    return request.headers.get("Authorization") == f"Bearer {METRICS_TOKEN}"
+
+
+@metrics_routes_blueprint.route("/metrics", methods=["GET"])
+def get_metrics():
+    if not _authorized():
+        return jsonify({"error": "Unauthorized"}), 401
+    return Response(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@metrics_routes_blueprint.route("/metrics/slow_queries", methods=["GET"])
+def get_slow_queries():
+    # Most recent slow statements in this worker, newest first. They contain raw SQL,
+    # so this is only served when METRICS_TOKEN is set
+    if not _authorized(required=True):
+        return jsonify({"error": "Unauthorized"}), 401
+    return jsonify(list(reversed(slow_queries)))
@@ -1,158 +1,374 @@
-from flask import Blueprint, jsonify, request, g
-from models import Activity, Organizer
-from db import SessionLocal
+import logging
+from flask import Blueprint, Response, jsonify, request, g, stream_with_context
+from models import ACTIVITY_FIELDS, ARCHIVED_ACTIVITY_FIELDS, Activity, ActivityOccurrence, ArchivedActivity, Organizer
+from db import get_session
 from decorators import token_required
-from datetime import datetime, timedelta
-from utils.link_validation import is_valid_link
-from collections import Counter
+from datetime import datetime, timezone
+from itertools import islice
+from utils.activity_validation import activity_values
+from utils.avatars import store_avatar
+from utils.bulk import export_rows, import_activities, iter_csv, iter_ndjson
+from utils.events import event_broker
+from utils.facets import facet_index, facet_values
+from utils.ical import vevent_cache
+from utils.intervals import check_duration, describe, find_conflicts, scheduled_intervals
+from utils.join_counter import join_counter
+from utils.response_cache import response_cache
+from sqlalchemy import and_, tuple_
+from utils.organizer_stats import (
+    ensure_stats, get_stats, record_activity_added, record_activity_removed, record_topic_changed,
+)
+from utils.pagination import parse_limit, encode_cursor, decode_cursor
+from utils.recurrence import (
+    format_rule, horizon, is_occurrence, load_exceptions, organizer_occurrences, parse_occurrence, parse_rule,
+    reschedule_exceptions, series_ends_at, series_schedule,
+)
+from utils.serializers import parse_fields
+from utils.streaming import stream_ndjson, wants_stream
+from utils.timezones import compute_schedule, request_timezone, resolve_timezone, to_zone, utc_now, week_bounds
 
 organizer_routes_blueprint = Blueprint("organizers", __name__)
+logger = logging.getLogger(__name__)
+
+def _conflict_response(session, data, intervals, exclude_id=None, exclude_occurrence=None):
+    # 409 listing the organizer's overlapping sessions, unless the request sets allow_overlap
+    if data.get("allow_overlap"):
+        return None
+    conflicts = find_conflicts(session, g.organizer_id, intervals, exclude_id, exclude_occurrence)
+    if not conflicts:
+        return None
+    return jsonify({
+        "error": "This overlaps with another one of your activities",
+        "conflicts": [describe(occurrence) for occurrence in conflicts],
+    }), 409
+
 
 @organizer_routes_blueprint.route("/activities", methods=["POST"])
 @token_required
 def add_activity():
     data = request.json
-    required_fields = ["title", "description", "topic", "age_group", "date", "time", "join_link", "duration"]
-    if not all(field in data for field in required_fields):
-        return jsonify({"error": "Missing required fields"}), 400
-    
-    if not is_valid_link(data["join_link"]):
-        return jsonify({"error": "Invalid join link. Only Google Meet and Zoom allowed!"}), 400
+    try:
+        fields = activity_values(data, g.organizer_id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    session = get_session()
+    activity = Activity(**fields)
+    conflict = _conflict_response(session, data, scheduled_intervals(activity, utc_now()))
+    if conflict:
+        return conflict
 
-    session = SessionLocal()
     try:
-        activity = Activity(
-            title=data["title"],
-            topic=data["topic"],
-            description=data["description"],
-            age_group=data["age_group"],
-            date=datetime.fromisoformat(data["date"]).date(),
-            time=data["time"],
-            join_link=data["join_link"],
-            organizer_id=g.organizer_id,
-            duration=data["duration"],
-            materials=data.get("materials", "")
-        )
+        ensure_stats(session, g.organizer_id)
+        values = facet_values(activity)
         session.add(activity)
+        record_activity_added(session, g.organizer_id, activity.topic)
         session.commit()
+        facet_index.add(values)
+        response_cache.invalidate("activities", f"organizer:{g.organizer_id}")
+        event_broker.publish("activity.created", activity.as_dict(include_relationships=True))
         return jsonify({"message": "Activity created", "id": activity.id}), 201
     except Exception as e:
         session.rollback()
         return jsonify({"error": str(e)}), 500
-    finally:
-        session.close()
 
 
 @organizer_routes_blueprint.route("/activities/<int:activity_id>", methods=["PUT"])
 @token_required
 def update_activity(activity_id):
     data = request.json
-    session = SessionLocal()
+    session = get_session()
     activity = session.query(Activity).filter_by(id=activity_id).first()
 
     if not activity:
-        session.close()
         return jsonify({"error": "Activity not found"}), 404
 
     if activity.organizer_id != g.organizer_id:
-        session.close()
         return jsonify({"error": "Unauthorized – you don't own this activity"}), 403
 
+    ensure_stats(session, g.organizer_id)
+    old_values = facet_values(activity)
+
     # Update allowed fields
-    for field in ["title", "description", "topic", "age_group", "date", "time", "join_link"]:
-        if field in data:
-            if field == "date":
-                setattr(activity, field, datetime.fromisoformat(data[field]).date())
+    rescheduled = any(field in data for field in ["date", "time", "timezone", "duration", "recurrence"])
+    old_timezone = activity.timezone
+    try:
+        for field in ["title", "description", "topic", "age_group", "date", "time", "timezone", "duration", "join_link", "recurrence"]:
+            if field in data:
+                if field == "date":
+                    setattr(activity, field, datetime.fromisoformat(data[field]).date())
+                elif field == "recurrence":
+                    # An empty value turns a series back into a single activity
+                    activity.recurrence = format_rule(parse_rule(data[field])) if data[field] else None
+                else:
+                    setattr(activity, field, data[field])
+
+        # Keep the normalized UTC start/end and the occurrence rows in step with the local schedule
+        if rescheduled:
+            if activity.recurrence:
+                activity.starts_at, activity.ends_at, activity.recurrence_ends_at = series_schedule(
+                    activity.date, activity.time, activity.duration, activity.timezone, activity.recurrence
+                )
+                reschedule_exceptions(session, activity, old_timezone)
+                activity.recurrence_ends_at = series_ends_at(session, activity)
             else:
-                setattr(activity, field, data[field])
+                activity.starts_at, activity.ends_at = compute_schedule(
+                    activity.date, activity.time, activity.duration, activity.timezone
+                )
+                activity.recurrence_ends_at = None
+                reschedule_exceptions(session, activity, old_timezone)
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid date, time, duration, timezone or recurrence"}), 400
+
+    if rescheduled:
+        try:
+            check_duration(activity.starts_at, activity.ends_at)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        exceptions = load_exceptions(session, [activity_id]).get(activity_id)
+        conflict = _conflict_response(
+            session, data, scheduled_intervals(activity, utc_now(), exceptions), exclude_id=activity_id,
+        )
+        if conflict:
+            return conflict
+    new_values = facet_values(activity)
+    record_topic_changed(session, g.organizer_id, old_values["topic"], new_values["topic"])
+    activity.updated_at = utc_now()
 
     session.commit()
-    session.close()
+    facet_index.remove(old_values)
+    facet_index.add(new_values)
+    vevent_cache.forget(activity_id)
+    response_cache.invalidate("activities", f"activity:{activity_id}", f"organizer:{g.organizer_id}")
+
+    # Only the fields that were sent, plus the derived UTC times
+    current = activity.as_dict(include_relationships=True)
+    changes = {field: current[field] for field in data if field in current and field != "organizer"}
+    changes.update(
+        id=activity_id, startsAt=current["startsAt"], endsAt=current["endsAt"], recurrenceEndsAt=current["recurrenceEndsAt"],
+    )
+    event_broker.publish("activity.updated", changes)
     return jsonify({"message": "Activity updated"})
 
 
 @organizer_routes_blueprint.route("/activities/<int:activity_id>", methods=["DELETE"])
 @token_required
 def delete_activity(activity_id):
-    with SessionLocal() as session:
-        activity = session.query(Activity).filter_by(id=activity_id).first()
-        if not activity:
-            return jsonify({"error": "Activity not found"}), 404
-        if activity.organizer_id != g.organizer_id:
-            return jsonify({"error": "Unauthorized – you don't own this activity"}), 403
-        session.delete(activity)
-        session.commit()
-        return jsonify({"message": "Activity deleted"}), 200
+    session = get_session()
+    activity = session.query(Activity).filter_by(id=activity_id).first()
+    if not activity:
+        return jsonify({"error": "Activity not found"}), 404
+    if activity.organizer_id != g.organizer_id:
+        return jsonify({"error": "Unauthorized – you don't own this activity"}), 403
+    ensure_stats(session, g.organizer_id)
+    old_values = facet_values(activity)
+    record_activity_removed(session, g.organizer_id, activity.topic, activity.total_times_join_pressed)
+    session.query(ActivityOccurrence).filter_by(activity_id=activity_id).delete()
+    session.delete(activity)
+    session.commit()
+    facet_index.remove(old_values)
+    join_counter.forget(activity_id)
+    vevent_cache.forget(activity_id)
+    response_cache.invalidate("activities", f"activity:{activity_id}", f"organizer:{g.organizer_id}")
+    event_broker.publish("activity.deleted", {"id": activity_id})
+    return jsonify({"message": "Activity deleted"}), 200
+
+
+@organizer_routes_blueprint.route("/activities/<int:activity_id>/occurrences/<occurrence>", methods=["PUT"])
+@token_required
+def update_occurrence(activity_id, occurrence):
+    # Cancel ({"cancelled": true}) or move ({"date", "time"} in the series' timezone) one occurrence
+    data = request.json or {}
+    session = get_session()
+    activity = session.query(Activity).filter_by(id=activity_id).first()
+    if not activity:
+        return jsonify({"error": "Activity not found"}), 404
+    if activity.organizer_id != g.organizer_id:
+        return jsonify({"error": "Unauthorized – you don't own this activity"}), 403
+    if not activity.recurrence:
+        return jsonify({"error": "This activity doesn't repeat"}), 400
+
+    try:
+        original_start = parse_occurrence(occurrence)
+    except ValueError:
+        return jsonify({"error": "Invalid occurrence"}), 400
+    if not is_occurrence(activity, original_start):
+        return jsonify({"error": "Occurrence not found"}), 404
+
+    old_values = facet_values(activity)
+    exception = session.get(ActivityOccurrence, (activity_id, original_start))
+    if exception is None:
+        exception = ActivityOccurrence(
+            activity_id=activity_id, original_start=original_start, cancelled=False, total_times_join_pressed=0,
+        )
+        session.add(exception)
+
+    if "cancelled" in data:
+        exception.cancelled = bool(data["cancelled"])
+    if "date" in data or "time" in data:
+        local = original_start.replace(tzinfo=timezone.utc).astimezone(resolve_timezone(activity.timezone))
+        try:
+            new_date = datetime.fromisoformat(data["date"]).date() if "date" in data else local.date()
+            new_time = data.get("time", local.strftime("%H:%M"))
+            exception.starts_at, exception.ends_at = compute_schedule(
+                new_date, new_time, activity.duration, activity.timezone
+            )
+        except (TypeError, ValueError):
+            return jsonify({"error": "Invalid date or time"}), 400
+        # Other occurrences of the same series count too, only the one being moved is left out
+        conflict = _conflict_response(
+            session, data, [(exception.starts_at, exception.ends_at)], exclude_occurrence=(activity_id, original_start),
+        )
+        if conflict:
+            return conflict
+
+    session.flush()
+    # A bounded series stays listed until its last occurrence, wherever that was moved to
+    activity.recurrence_ends_at = series_ends_at(session, activity)
+    activity.updated_at = utc_now()
+    session.commit()
+    facet_index.remove(old_values)
+    facet_index.add(facet_values(activity))
+    vevent_cache.forget(activity_id)
+    response_cache.invalidate("activities", f"activity:{activity_id}", f"organizer:{g.organizer_id}")
+    event_broker.publish("occurrence.updated", {
+        "id": activity_id,
+        "occurrenceStart": to_zone(original_start, None),
+        "cancelled": exception.cancelled,
+        "startsAt": to_zone(exception.starts_at or original_start, None),
+    })
+    return jsonify({"message": "Occurrence updated"}), 200
 
 
 @organizer_routes_blueprint.route("/activities/mine", methods=["GET"])
 @token_required
 def get_my_activities():
-    session = SessionLocal()
+    session = get_session()
+    cursor = request.args.get("cursor")
+    paginated = "limit" in request.args or cursor is not None
+
     try:
-        activities = session.query(Activity).filter_by(organizer_id=g.organizer_id).all()
-        result = [a.as_dict(include_relationships=True) for a in activities]
-
-        today = datetime.now().date()
-        now = datetime.now().time()
-
-        # Calculate the current week's Sunday and Saturday
-        weekday = today.weekday()  # Monday=0 ... Sunday=6
-        days_since_sunday = (weekday + 1) % 7
-        sunday_start = today - timedelta(days=days_since_sunday)
-        saturday_end = sunday_start + timedelta(days=6)
-
-        for activity in result:
-            # Parse activity date
-            if isinstance(activity["date"], str):
-                activity_date = datetime.fromisoformat(activity["date"]).date()
-            else:
-                activity_date = activity["date"]
+        limit = parse_limit(request.args.get("limit"))
+        after = decode_cursor(cursor) if cursor else None
+        if after:
+            after = (datetime.fromisoformat(after[0]), int(after[1]))
+    except (IndexError, TypeError, ValueError):
+        return jsonify({"error": "Invalid limit or cursor"}), 400
 
-            # Parse activity time
-            activity_time = datetime.strptime(activity["time"], "%H:%M").time()
+    try:
+        tz = request_timezone()
+        fields = parse_fields(request.args.get("fields"), ACTIVITY_FIELDS | {"isPast", "isThisWeek"})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        now = utc_now()
+        # This week runs from Sunday to Saturday in the caller's timezone
+        week_start, week_end = week_bounds(tz or resolve_timezone(None))
+
+        query = (
+            session.query(Activity)
+            .options(*Activity.load_options(fields))
+            .filter(Activity.organizer_id == g.organizer_id)
+        )
+        # Single activities get their flags from the database; series occurrences are
+        # expanded in Python and compared with the same bounds in serialize()
+        flags = {
+            # isPast flag: activity starts before now
+            "isPast": Activity.starts_at < now,
+            # isThisWeek flag: activity starts this week, and not in the past
+            "isThisWeek": and_(Activity.starts_at >= week_start, Activity.starts_at < week_end, Activity.starts_at >= now),
+        }
+        flags = [flag.label(name) for name, flag in flags.items() if fields is None or name in fields]
+        # Sorted by start time descending (most recent first); series are expanded
+        # into their occurrences, up to the recurrence horizon
+        occurrences = organizer_occurrences(session, query, horizon(now), after, flags)
 
-            # isPast flag: activity date/time before now
-            activity["isPast"] = activity_date < today or (activity_date == today and activity_time < now)
+        def serialize(occurrence):
+            data = occurrence.activity.as_dict(include_relationships=True, tz=tz, occurrence=occurrence, fields=fields)
+            if occurrence.columns is not None:
+                data.update({name: bool(value) for name, value in occurrence.columns.items()})
+                return data
+            starts_at = occurrence.starts_at
+            if fields is None or "isPast" in fields:
+                data["isPast"] = starts_at is not None and starts_at < now
+            if fields is None or "isThisWeek" in fields:
+                data["isThisWeek"] = starts_at is not None and week_start <= starts_at < week_end and starts_at >= now
+            return data
 
-            # isThisWeek flag: activity date between this Sunday and Saturday, and not in the past
-            activity["isThisWeek"] = (sunday_start <= activity_date <= saturday_end) and (activity_date >= today)
+        if wants_stream():
+            return stream_ndjson(occurrences, serialize)
 
-        # Sort activities by date/time descending (most recent first)
-        result.sort(key=lambda x: (x["date"], x["time"]), reverse=True)
+        if not paginated:
+            return jsonify([serialize(o) for o in occurrences]), 200
 
-        return jsonify(result), 200
+        page = list(islice(occurrences, limit + 1))
+        result = [serialize(o) for o in page[:limit]]
+        next_cursor = None
+        if len(page) > limit:
+            last = page[limit - 1]
+            next_cursor = encode_cursor([last.starts_at.isoformat(), last.activity.id])
+        return jsonify({"activities": result, "nextCursor": next_cursor}), 200
     except Exception as e:
         print(f"Error fetching activities: {e}")
         return jsonify({"error": str(e)}), 500
-    finally:
-        session.close()
+
+
+@organizer_routes_blueprint.route("/activities/mine/history", methods=["GET"])
+@token_required
+def get_my_archived_activities():
+    # Activities the archiver moved out of the live table, most recent first
+    session = get_session()
+    cursor = request.args.get("cursor")
+    paginated = "limit" in request.args or cursor is not None
+
+    try:
+        limit = parse_limit(request.args.get("limit"))
+        before = decode_cursor(cursor) if cursor else None
+        if before:
+            before = (datetime.fromisoformat(before[0]), int(before[1]))
+        tz = request_timezone()
+        fields = parse_fields(request.args.get("fields"), ARCHIVED_ACTIVITY_FIELDS)
+    except (IndexError, TypeError, ValueError):
+        return jsonify({"error": "Invalid limit, cursor, timezone or fields"}), 400
+
+    query = (
+        session.query(ArchivedActivity)
+        .filter(ArchivedActivity.organizer_id == g.organizer_id)
+        .order_by(ArchivedActivity.starts_at.desc(), ArchivedActivity.id.desc())
+    )
+    if before:
+        query = query.filter(tuple_(ArchivedActivity.starts_at, ArchivedActivity.id) < before)
+
+    if wants_stream():
+        return stream_ndjson(query, lambda a: a.as_dict(tz=tz, fields=fields))
+    if not paginated:
+        return jsonify([a.as_dict(tz=tz, fields=fields) for a in query]), 200
+
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor([last.starts_at.isoformat(), last.id])
+    return jsonify({"activities": [a.as_dict(tz=tz, fields=fields) for a in rows[:limit]], "nextCursor": next_cursor}), 200
 
 
 @organizer_routes_blueprint.route("/organizer/me", methods=["GET"])
 @token_required
 def get_organizer_info():
     try:
-        with SessionLocal() as session:
-            organizer: Organizer = session.query(Organizer).filter_by(id=g.organizer_id).first()
-            if not organizer:
-                return jsonify({"error": "Organizer not found"}), 404
-
-            # Convert organizer to dict using the mixin
-            organizer_data = organizer.as_dict()
-            
-            # Compute extra fields not part of the DB model
-            # get all activities for this organizer
-            activities = session.query(Activity).filter_by(organizer_id=g.organizer_id).all()
-
-            topic_counts = Counter(activity.topic for activity in activities)
-
-            organizer_data.update({
-                "totalActivities": len(activities),
-                "totalTimesJoinPressed": sum(a.total_times_join_pressed for a in activities),
-                "specialties": [topic for topic, _ in topic_counts.most_common(5)],
-            })
-            return jsonify(organizer_data), 200
+        session = get_session()
+        organizer: Organizer = session.query(Organizer).filter_by(id=g.organizer_id).first()
+        if not organizer:
+            return jsonify({"error": "Organizer not found"}), 404
+
+        # Convert organizer to dict using the mixin
+        organizer_data = organizer.as_dict()
+
+        # Totals and top-5 topics come from the incrementally maintained summary
+        organizer_data.update(get_stats(session, g.organizer_id))
+        session.commit()  # keeps the summary if it was just computed
+        return jsonify(organizer_data), 200
 
     except Exception as e:
         print(f"Error in /organizer/me: {e}")
@@ -163,7 +379,7 @@ def get_organizer_info():
 @token_required
 def update_organizer_info():
     data = request.json
-    session = SessionLocal()
+    session = get_session()
     
     try:
         organizer = session.query(Organizer).filter_by(id=g.organizer_id).first()
@@ -175,12 +391,64 @@ def update_organizer_info():
         if "bio" in data:
             organizer.bio = data["bio"]
         if "avatarBase64" in data:
-            organizer.avatar_base64 = data["avatarBase64"]
+            try:
+                organizer.avatar_hash = store_avatar(session, data["avatarBase64"]) if data["avatarBase64"] else None
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            organizer.avatar_base64 = None
         
         session.commit()
+        # Organizer details are embedded in every cached activity payload
+        response_cache.invalidate(f"organizer:{g.organizer_id}")
         return jsonify({"message": "Profile updated successfully"}), 200
     except Exception as e:
         session.rollback()
         return jsonify({"error": str(e)}), 500
+
+
+@organizer_routes_blueprint.route("/activities/bulk", methods=["POST"])
+@token_required
+def bulk_import_activities():
+    # Body is NDJSON (one activity per line) or CSV with a header row, read as a stream
+    content_type = request.mimetype
+    if content_type in ("application/x-ndjson", "application/jsonl"):
+        rows = iter_ndjson(request.stream)
+    elif content_type == "text/csv":
+        rows = iter_csv(request.stream)
+    else:
+        return jsonify({"error": "Send activities as application/x-ndjson or text/csv"}), 415
+
+    session = get_session()
+    try:
+        result = import_activities(session, g.organizer_id, rows)
+    except Exception as e:
+        session.rollback()
+        logger.exception("Error importing activities")
+        return jsonify({"error": str(e)}), 500
     finally:
-        session.close()
\ No newline at end of file
+        # Batches committed before a failure are kept, so cached lists are stale either way
+        response_cache.invalidate("activities", f"organizer:{g.organizer_id}")
+    if result["created"]:
+        # Too many rows for individual events, clients refetch instead
+        event_broker.publish("activities.imported", {"organizer_id": g.organizer_id, "created": result["created"]})
+    return jsonify(result), 200
+
+
+@organizer_routes_blueprint.route("/activities/mine/export", methods=["GET"])
+@token_required
+def export_my_activities():
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in ("ndjson", "csv"):
+        return jsonify({"error": "format must be ndjson or csv"}), 400
+
+    query = (
+        get_session().query(Activity)
+        .filter(Activity.organizer_id == g.organizer_id)
+        .order_by(Activity.starts_at, Activity.id)
+    )
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return Response(
+        stream_with_context(export_rows(query, fmt)),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=activities.{fmt}"},
+    )
@@ -0,0 +1,64 @@
+from datetime import datetime
+from utils.intervals import check_duration
+from utils.link_validation import is_valid_link
+from utils.recurrence import format_rule, parse_rule, series_schedule
+from utils.timezones import compute_schedule, utc_now
+from config import DEFAULT_TIMEZONE
+
+REQUIRED_FIELDS = ["title", "description", "topic", "age_group", "date", "time", "join_link", "duration"]
+TEXT_FIELDS = ["title", "description", "topic", "age_group", "date", "time", "join_link", "timezone", "materials"]
+
+
+def activity_values(data: dict, organizer_id: int) -> dict:
+    """
+    Validate a new activity's input and return its column values.
+
+    Raises ValueError with a user-facing message; shared by add_activity and bulk imports.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object")
+    if not all(data.get(field) not in (None, "") for field in REQUIRED_FIELDS):
+        raise ValueError("Missing required fields")
+    for field in TEXT_FIELDS:
+        if data.get(field) is not None and not isinstance(data[field], str):
+            raise ValueError(f"{field} must be a string")
+
+    if not is_valid_link(data["join_link"]):
+        raise ValueError("Invalid join link. Only Google Meet and Zoom allowed!")
+
+    try:
+        activity_date = datetime.fromisoformat(data["date"]).date()
+        starts_at, ends_at = compute_schedule(activity_date, data["time"], data["duration"], data.get("timezone"))
+    except (TypeError, ValueError):
+        raise ValueError("Invalid date, time, duration or timezone")
+    check_duration(starts_at, ends_at)
+
+    recurrence, recurrence_ends_at = None, None
+    if data.get("recurrence"):
+        try:
+            recurrence = format_rule(parse_rule(str(data["recurrence"])))
+        except ValueError as e:
+            raise ValueError(f"Invalid recurrence: {e}")
+        starts_at, ends_at, recurrence_ends_at = series_schedule(
+            activity_date, data["time"], data["duration"], data.get("timezone"), recurrence
+        )
+
+    return {
+        "title": data["title"],
+        "topic": data["topic"],
+        "description": data["description"],
+        "age_group": data["age_group"],
+        "date": activity_date,
+        "time": data["time"],
+        "timezone": data.get("timezone") or DEFAULT_TIMEZONE,
+        "starts_at": starts_at,
+        "ends_at": ends_at,
+        "recurrence": recurrence,
+        "recurrence_ends_at": recurrence_ends_at,
+        "join_link": data["join_link"],
+        "organizer_id": organizer_id,
+        "duration": data["duration"],
+        "materials": data.get("materials") or "",
+        "total_times_join_pressed": 0,
+        "updated_at": utc_now(),
+    }
@@ -0,0 +1,91 @@
+import base64
+import binascii
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from PIL import Image, UnidentifiedImageError
+from models import AvatarImage
+from utils.metrics import record_cache_lookup
+
+MAX_AVATAR_BYTES = 2 * 1024 * 1024
+THUMBNAIL_SIZE = (96, 96)
+CACHE_MAX_ENTRIES = 256
+
+
+def decode_avatar(value: str) -> tuple[str, bytes]:
+    # Accepts a data URL ("data:image/png;base64,...") or bare base64
+    _, sep, payload = value.partition(",")
+    if not sep:
+        payload = value
+    try:
+        raw = base64.b64decode(payload, validate=True)
+    except (binascii.Error, ValueError):
+        raise ValueError("Avatar is not valid base64")
+
+    if len(raw) > MAX_AVATAR_BYTES:
+        raise ValueError("Avatar image is too large")
+
+    try:
+        with Image.open(io.BytesIO(raw)) as image:
+            image_format = image.format
+            image.verify()
+    except (UnidentifiedImageError, OSError, SyntaxError):
+        raise ValueError("Avatar is not a supported image")
+
+    mime_type = Image.MIME.get(image_format)
+    if not mime_type:
+        raise ValueError("Avatar is not a supported image")
+    return mime_type, raw
+
+
+def make_thumbnail(raw: bytes) -> bytes:
+    with Image.open(io.BytesIO(raw)) as image:
+        image.thumbnail(THUMBNAIL_SIZE)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+        output = io.BytesIO()
+        image.save(output, format="PNG", optimize=True)
+        return output.getvalue()
+
+
+def store_avatar(session, value: str) -> str:
+    """Store an uploaded avatar once per content hash and return the hash."""
+    mime_type, raw = decode_avatar(value)
+    content_hash = hashlib.sha256(raw).hexdigest()
+
+    if not session.get(AvatarImage, content_hash):
+        session.add(AvatarImage(
+            hash=content_hash,
+            mime_type=mime_type,
+            data=raw,
+            thumbnail=make_thumbnail(raw),
+        ))
+    return content_hash
+
+
+class AvatarCache:
+    """Small LRU of avatar bytes; entries never go stale since keys are content hashes."""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        record_cache_lookup("avatar", entry is not None)
+        return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+avatar_cache = AvatarCache()
@@ -0,0 +1,126 @@
+import csv
+import io
+import json
+from collections import Counter
+from sqlalchemy import insert
+from models import Activity
+from utils.activity_validation import activity_values
+from utils.facets import facet_index
+from utils.organizer_stats import ensure_stats, record_activities_added
+
+BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 1000
+
+# Columns written by exports; the same file can be imported again
+EXPORT_FIELDS = [
+    "id", "title", "description", "topic", "age_group", "date", "time", "timezone",
+    "duration", "recurrence", "join_link", "materials", "total_times_join_pressed",
+]
+
+
+def iter_ndjson(stream):
+    # Yields (row number, dict or error message) one line at a time
+    for number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield number, "Invalid JSON"
+            continue
+        yield number, row if isinstance(row, dict) else "Expected a JSON object"
+
+
+def _is_utf8(row: dict) -> bool:
+    # Undecodable bytes come through as lone surrogates, which don't encode back
+    try:
+        for value in row.values():
+            if isinstance(value, str):
+                value.encode("utf-8")
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+def iter_csv(stream):
+    # Yields (row number, dict or error message); a bad row doesn't end the import
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig", errors="surrogateescape", newline=""))
+    number = 0
+    while True:
+        number += 1
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            yield number, f"Invalid CSV: {e}"
+            continue
+        yield number, row if _is_utf8(row) else "Invalid UTF-8"
+
+
+def import_activities(session, organizer_id: int, rows) -> dict:
+    """
+    Validate and insert activities from an iterator of (row number, row) pairs.
+
+    Valid rows are inserted with one executemany per BATCH_SIZE rows, each batch in
+    its own transaction, so memory use doesn't grow with the size of the upload.
+    """
+    ensure_stats(session, organizer_id)
+    session.commit()
+
+    created, failed, errors = 0, 0, []
+    batch = []
+
+    def flush():
+        nonlocal created
+        if not batch:
+            return
+        session.execute(insert(Activity.__table__), batch)
+        record_activities_added(session, organizer_id, Counter(values["topic"] for values in batch))
+        session.commit()
+        for values in batch:
+            facet_index.add(values)
+        created += len(batch)
+        batch.clear()
+
+    for number, row in rows:
+        try:
+            if isinstance(row, str):
+                raise ValueError(row)
+            batch.append(activity_values(row, organizer_id))
+        except ValueError as e:
+            failed += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"row": number, "error": str(e)})
+            continue
+        if len(batch) >= BATCH_SIZE:
+            flush()
+    flush()
+
+    return {"created": created, "failed": failed, "errors": errors}
+
+
+def export_rows(query, fmt: str):
+    """Yield an export of the activities in query as NDJSON or CSV, one chunk per batch."""
+    columns = [getattr(Activity, field) for field in EXPORT_FIELDS]
+    rows = query.with_entities(*columns).yield_per(BATCH_SIZE)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == "csv" else None
+    if writer:
+        writer.writerow(EXPORT_FIELDS)
+
+    for count, row in enumerate(rows, start=1):
+        values = [value.isoformat() if hasattr(value, "isoformat") else value for value in row]
+        if writer:
+            writer.writerow(values)
+        else:
+            buffer.write(json.dumps(dict(zip(EXPORT_FIELDS, values))) + "\n")
+        if count % BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
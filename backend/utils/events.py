@@ -0,0 +1,203 @@
+import logging
+import queue
+import sys
+import threading
+import time
+from datetime import timedelta
+from flask import json
+from sqlalchemy import func, insert, or_, select
+from db import engine
+from models import ActivityEvent
+from utils.timezones import utc_now
+from config import (
+    EVENTS_CLIENT_QUEUE_SIZE, EVENTS_HEARTBEAT_SECONDS, EVENTS_LAG_SECONDS, EVENTS_MAX_CLIENTS,
+    EVENTS_MAX_THREADED_CLIENTS, EVENTS_POLL_SECONDS,
+)
+
+HEARTBEAT = ": keep-alive\n\n"
+
+logger = logging.getLogger(__name__)
+
+
+def _format(event_id, event: str, data: str) -> str:
+    return f"id: {event_id}\nevent: {event}\ndata: {data}\n\n"
+
+
+def _cooperative() -> bool:
+    # Under gevent or eventlet each open stream is a greenlet, not a blocked thread
+    gevent_monkey = sys.modules.get("gevent.monkey")
+    if gevent_monkey is not None and gevent_monkey.is_module_patched("socket"):
+        return True
+    eventlet_patcher = sys.modules.get("eventlet.patcher")
+    return eventlet_patcher is not None and eventlet_patcher.is_monkey_patched("socket")
+
+
+def stream_capacity(environ) -> int:
+    """How many event streams this worker may hold open: none on sync workers, where one would block the worker."""
+    if _cooperative():
+        return EVENTS_MAX_CLIENTS
+    if environ.get("wsgi.multithread"):
+        return EVENTS_MAX_THREADED_CLIENTS
+    return 0
+
+
+class Subscription:
+    """One connected client: a bounded queue of encoded events."""
+
+    def __init__(self, broker, heartbeat_seconds):
+        self._broker = broker
+        self._heartbeat_seconds = heartbeat_seconds
+        self._queue = queue.Queue(maxsize=broker.client_queue_size)
+        self.dropped = False
+
+    def offer(self, chunk: str) -> bool:
+        try:
+            self._queue.put_nowait(chunk)
+            return True
+        except queue.Full:
+            return False
+
+    def __iter__(self):
+        while not self.dropped:
+            try:
+                chunk = self._queue.get(timeout=self._heartbeat_seconds)
+            except queue.Empty:
+                yield HEARTBEAT
+                continue
+            if self.dropped:
+                break
+            yield chunk
+
+    def close(self):
+        self._broker.unsubscribe(self)
+
+
+class EventBroker:
+    """
+    Publisher for the /activities/events stream, shared by all workers through activity_events.
+
+    publish() stores an event. While a worker has clients, a poller thread reads new rows
+    every poll_interval seconds, encodes each once and offers it to every subscriber's
+    bounded queue. A client that falls a full queue behind is dropped instead of slowing
+    down the poller; it reconnects with Last-Event-ID (the row id) to any worker and
+    catches up from the table, or gets a "reset" event when that is no longer possible.
+
+    Ids only commit in order on SQLite. Elsewhere a row can become visible after one with a
+    higher id, so each poll also re-reads the rows created in the last lag_seconds and skips
+    those already offered; a publish that takes longer than that to commit is missed.
+    """
+
+    def __init__(self, client_queue_size=EVENTS_CLIENT_QUEUE_SIZE, heartbeat_seconds=EVENTS_HEARTBEAT_SECONDS,
+                 poll_interval=EVENTS_POLL_SECONDS, lag_seconds=EVENTS_LAG_SECONDS):
+        self.client_queue_size = client_queue_size
+        self.heartbeat_seconds = heartbeat_seconds
+        self.poll_interval = poll_interval
+        self.lag_seconds = lag_seconds
+        self._last_id = 0  # newest row offered to subscribers
+        self._seen = {}  # id -> created_at of rows inside the lag window that were already offered
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def publish(self, event: str, data):
+        data = json.dumps(data, separators=(",", ":"))
+        try:
+            with engine.begin() as connection:
+                connection.execute(insert(ActivityEvent.__table__).values(event=event, data=data, created_at=utc_now()))
+        except Exception as e:
+            logger.warning("Error publishing %s event: %s", event, e)
+
+    def subscribe(self, last_event_id: str | None = None, capacity: int = EVENTS_MAX_CLIENTS) -> Subscription | None:
+        """Register a client, queueing what it missed since last_event_id. None when at capacity."""
+        subscription = Subscription(self, self.heartbeat_seconds)
+        with self._lock:
+            if len(self._subscribers) >= capacity:
+                return None
+            if self._thread is None:
+                # Polling starts from the current end of the table
+                table = ActivityEvent.__table__
+                with engine.connect() as connection:
+                    self._last_id = connection.execute(select(func.max(table.c.id))).scalar() or 0
+                    self._seen = dict(connection.execute(
+                        select(table.c.id, table.c.created_at).where(table.c.created_at >= self._window_start())
+                    ).all())
+                self._thread = threading.Thread(target=self._run, name="event-poller", daemon=True)
+                self._thread.start()
+            if last_event_id:
+                missed = self._missed_since(last_event_id)
+                if missed is None:
+                    # Can't replay: the client should refetch whatever it is showing
+                    subscription.offer(_format(self._last_id, "reset", "{}"))
+                else:
+                    for chunk in missed:
+                        subscription.offer(chunk)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def _window_start(self):
+        return utc_now() - timedelta(seconds=self.lag_seconds)
+
+    def _rows(self, connection, after: int, until: int | None = None, limit: int | None = None, since=None):
+        # Rows after the given id, plus any created since `since` whatever their id
+        table = ActivityEvent.__table__
+        condition = table.c.id > after if since is None else or_(table.c.id > after, table.c.created_at >= since)
+        query = select(table.c.id, table.c.event, table.c.data, table.c.created_at).where(condition).order_by(table.c.id)
+        if until is not None:
+            query = query.where(table.c.id <= until)
+        if limit is not None:
+            query = query.limit(limit)
+        return connection.execute(query).all()
+
+    def _missed_since(self, last_event_id: str) -> list | None:
+        # Called with the lock held, so the poller can't move _last_id meanwhile
+        if not last_event_id.isdigit():
+            return None  # an id from before events were stored
+        last_id = int(last_event_id)
+        if last_id > self._last_id:
+            return None
+        if last_id == self._last_id:
+            return []
+        with engine.connect() as connection:
+            oldest = connection.execute(select(func.min(ActivityEvent.id))).scalar()
+            if oldest is None or last_id < oldest - 1:
+                return None  # the events in between were pruned
+            rows = self._rows(connection, last_id, self._last_id, self.client_queue_size)
+        if len(rows) >= self.client_queue_size:
+            return None
+        return [_format(row.id, row.event, row.data) for row in rows]
+
+    def _run(self):
+        while True:
+            time.sleep(self.poll_interval)
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None  # the next subscriber starts a new poller
+                    return
+                last_id = self._last_id
+            since = self._window_start()
+            try:
+                with engine.connect() as connection:
+                    rows = self._rows(connection, last_id, since=since)
+            except Exception as e:
+                logger.warning("Error reading activity events: %s", e)
+                continue
+            with self._lock:
+                for row in rows:
+                    if row.id in self._seen:
+                        continue
+                    chunk = _format(row.id, row.event, row.data)
+                    for subscription in list(self._subscribers):
+                        if not subscription.offer(chunk):
+                            subscription.dropped = True
+                            self._subscribers.discard(subscription)
+                    self._seen[row.id] = row.created_at
+                    self._last_id = max(self._last_id, row.id)
+                # Rows older than the window are no longer read again
+                self._seen = {event_id: created_at for event_id, created_at in self._seen.items() if created_at >= since}
+
+
+event_broker = EventBroker()
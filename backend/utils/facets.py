@@ -0,0 +1,104 @@
+import threading
+import time
+from collections import Counter
+from sqlalchemy import func
+from db import SessionLocal
+from models import Activity, ArchivedActivity
+from utils.recurrence import upcoming_clause
+from utils.timezones import utc_now
+from config import FACET_REFRESH_SECONDS
+
+FACETS = ("topic", "age_group")
+
+
+def facet_values(activity) -> dict:
+    # Snapshot of the fields the index cares about, taken before an activity is changed
+    return {
+        "topic": activity.topic,
+        "age_group": activity.age_group,
+        "starts_at": activity.starts_at,
+        "recurrence": activity.recurrence,
+        "recurrence_ends_at": activity.recurrence_ends_at,
+    }
+
+
+def _is_upcoming(values: dict, now) -> bool:
+    # Same rule as recurrence.upcoming_clause: a series counts while it has occurrences left
+    if values.get("recurrence"):
+        return values["recurrence_ends_at"] is None or values["recurrence_ends_at"] >= now
+    return values["starts_at"] is not None and values["starts_at"] >= now
+
+
+class FacetIndex:
+    """
+    Per-topic and per-age-group activity counts kept in memory.
+
+    Writes adjust the counts incrementally; a full GROUP BY rebuild runs at most
+    every refresh_seconds so activities that moved into the past drop out and
+    writes made by other workers are picked up. Archived activities keep their
+    values listed for the organizer forms.
+    """
+
+    def __init__(self, refresh_seconds=FACET_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._all = {facet: Counter() for facet in FACETS}
+        self._upcoming = {facet: Counter() for facet in FACETS}
+        self._built_at = None
+        self._lock = threading.Lock()
+
+    def _ensure_fresh(self):
+        if self._built_at is None or time.monotonic() - self._built_at > self.refresh_seconds:
+            self.rebuild()
+
+    def rebuild(self):
+        upcoming = upcoming_clause(utc_now())
+
+        all_counts, upcoming_counts = {}, {}
+        with SessionLocal() as session:
+            for facet in FACETS:
+                column = getattr(Activity, facet)
+                all_counts[facet] = Counter(dict(
+                    session.query(column, func.count(Activity.id)).group_by(column).all()
+                ))
+                archived = getattr(ArchivedActivity, facet)
+                all_counts[facet].update(dict(
+                    session.query(archived, func.count(ArchivedActivity.id)).group_by(archived).all()
+                ))
+                upcoming_counts[facet] = Counter(dict(
+                    session.query(column, func.count(Activity.id)).filter(upcoming).group_by(column).all()
+                ))
+
+        with self._lock:
+            self._all, self._upcoming = all_counts, upcoming_counts
+            self._built_at = time.monotonic()
+
+    def _apply(self, values: dict, delta: int):
+        if self._built_at is None:
+            return  # not loaded yet, the first rebuild will count this row
+        upcoming = _is_upcoming(values, utc_now())
+        with self._lock:
+            for facet in FACETS:
+                self._all[facet][values[facet]] += delta
+                if upcoming:
+                    self._upcoming[facet][values[facet]] += delta
+
+    def add(self, values: dict):
+        self._apply(values, 1)
+
+    def remove(self, values: dict):
+        self._apply(values, -1)
+
+    def values(self, facet: str) -> list:
+        # Every value ever used, for the organizer forms
+        self._ensure_fresh()
+        with self._lock:
+            return sorted(value for value, count in self._all[facet].items() if count > 0)
+
+    def upcoming_counts(self, facet: str) -> list:
+        self._ensure_fresh()
+        with self._lock:
+            counts = [(value, count) for value, count in self._upcoming[facet].items() if count > 0]
+        return [{"name": value, "count": count} for value, count in sorted(counts)]
+
+
+facet_index = FacetIndex()
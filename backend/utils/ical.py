@@ -0,0 +1,231 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import replace
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+from utils.metrics import record_cache_lookup
+from utils.recurrence import format_rule, is_occurrence, parse_rule
+from utils.timezones import parse_duration, resolve_timezone
+from config import ICAL_CACHE_MAX_EVENTS
+
+ICAL_MIMETYPE = "text/calendar"
+# Part of every feed's ETag, bump it when the rendering below changes
+FEED_FORMAT_VERSION = "3"
+UID_DOMAIN = "brighttimes"
+
+
+def _escape(value) -> str:
+    # TEXT values (RFC 5545, 3.3.11)
+    return (
+        str(value or "")
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def _fold(line: str) -> str:
+    # Content lines are folded at 75 octets, without splitting a UTF-8 sequence
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    parts, start, limit = [], 0, 75
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(encoded[start:end].decode())
+        start, limit = end, 74  # continuation lines start with a space
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _utc(value: datetime) -> str:
+    return value.strftime("%Y%m%dT%H%M%SZ")
+
+
+def _local(value: datetime, tz) -> str:
+    return value.replace(tzinfo=timezone.utc).astimezone(tz).strftime("%Y%m%dT%H%M%S")
+
+
+def _rrule(activity, tz) -> str:
+    # UNTIL is stored as a local date; iCalendar wants the UTC end of that day
+    rule = parse_rule(activity.recurrence)
+    value = format_rule(replace(rule, until=None))
+    if rule.until is not None:
+        last = datetime.combine(rule.until, time(23, 59, 59), tzinfo=tz).astimezone(timezone.utc)
+        value += f";UNTIL={last:%Y%m%dT%H%M%SZ}"
+    return value
+
+
+def render_vevent(activity, exceptions: dict | None = None) -> str:
+    """
+    The VEVENT block(s) for one activity, CRLF-terminated.
+
+    A series is one VEVENT with an RRULE in the activity's timezone, EXDATEs for
+    cancelled occurrences and an extra VEVENT (same UID, RECURRENCE-ID) per moved one.
+    """
+    if activity.starts_at is None:
+        return ""  # legacy row without a parseable time
+    uid = f"activity-{activity.id}@{UID_DOMAIN}"
+    stamp = _utc(activity.updated_at or activity.starts_at)
+    description = activity.description or ""
+    if activity.materials:
+        description += f"\n\nMaterials: {activity.materials}"
+    description += f"\n\nJoin: {activity.join_link}"
+    details = [
+        f"SUMMARY:{_escape(activity.title)}",
+        f"DESCRIPTION:{_escape(description)}",
+        f"LOCATION:{_escape(activity.join_link)}",
+        f"URL:{activity.join_link}",
+        f"CATEGORIES:{_escape(activity.topic)},{_escape(activity.age_group)}",
+    ]
+
+    if not activity.recurrence:
+        lines = ["BEGIN:VEVENT", f"UID:{uid}", f"DTSTAMP:{stamp}",
+                 f"DTSTART:{_utc(activity.starts_at)}", f"DTEND:{_utc(activity.ends_at)}", *details, "END:VEVENT"]
+        return "".join(_fold(line) for line in lines)
+
+    # Series are anchored in their own zone so clients follow its DST changes
+    tz = resolve_timezone(activity.timezone)
+    zone = f"TZID={tz.key}"
+    duration = parse_duration(activity.duration)
+    duration_value = f"PT{int(duration.total_seconds()) // 60}M"
+    # Rows left behind by an older rule don't belong to any occurrence
+    exceptions = {
+        original: exception for original, exception in (exceptions or {}).items() if is_occurrence(activity, original)
+    }
+
+    lines = ["BEGIN:VEVENT", f"UID:{uid}", f"DTSTAMP:{stamp}",
+             f"DTSTART;{zone}:{_local(activity.starts_at, tz)}", f"DURATION:{duration_value}",
+             f"RRULE:{_rrule(activity, tz)}"]
+    lines += [
+        f"EXDATE;{zone}:{_local(original, tz)}"
+        for original, exception in sorted(exceptions.items()) if exception.cancelled
+    ]
+    lines += [*details, "END:VEVENT"]
+    for original, exception in sorted(exceptions.items()):
+        if exception.cancelled or exception.starts_at is None:
+            continue
+        lines += ["BEGIN:VEVENT", f"UID:{uid}", f"DTSTAMP:{stamp}", f"RECURRENCE-ID;{zone}:{_local(original, tz)}",
+                  f"DTSTART;{zone}:{_local(exception.starts_at, tz)}", f"DURATION:{duration_value}",
+                  *details, "END:VEVENT"]
+    return "".join(_fold(line) for line in lines)
+
+
+def _offset(delta: timedelta) -> str:
+    # UTC-OFFSET values (RFC 5545, 3.3.14)
+    seconds = int(delta.total_seconds())
+    sign = "-" if seconds < 0 else "+"
+    hours, rest = divmod(abs(seconds), 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{sign}{hours:02d}{minutes:02d}" + (f"{seconds:02d}" if seconds else "")
+
+
+def _transitions(tz, start: int, end: int) -> list:
+    # UTC timestamps in [start, end) at which tz changes offset; zoneinfo doesn't list them,
+    # so offsets are probed once a day and each change is bisected down to the second
+    found = []
+    probe, offset = start, datetime.fromtimestamp(start, tz).utcoffset()
+    while probe < end:
+        following = probe + 86400
+        if datetime.fromtimestamp(following, tz).utcoffset() != offset:
+            low, high = probe, following
+            while high - low > 1:
+                middle = (low + high) // 2
+                if datetime.fromtimestamp(middle, tz).utcoffset() == offset:
+                    low = middle
+                else:
+                    high = middle
+            found.append(high)
+            offset = datetime.fromtimestamp(high, tz).utcoffset()
+        probe = following
+    return found
+
+
+def _observance(at: datetime, offset_from: timedelta) -> list:
+    kind = "DAYLIGHT" if at.dst() else "STANDARD"
+    onset = (at.astimezone(timezone.utc).replace(tzinfo=None) + offset_from).strftime("%Y%m%dT%H%M%S")
+    return [f"BEGIN:{kind}", f"DTSTART:{onset}", f"TZOFFSETFROM:{_offset(offset_from)}",
+            f"TZOFFSETTO:{_offset(at.utcoffset())}", f"TZNAME:{_escape(at.tzname())}", f"END:{kind}"]
+
+
+@lru_cache(maxsize=256)
+def vtimezone(key: str, first: date, last: date) -> str:
+    """
+    The VTIMEZONE block defining TZID key from first to last, CRLF-terminated.
+
+    Every offset change in that span is listed as its own observance, with the offset
+    in effect at first as the initial one.
+    """
+    tz = resolve_timezone(key)
+    start = int(datetime.combine(first, time(), tzinfo=timezone.utc).timestamp())
+    end = int(datetime.combine(last, time(), tzinfo=timezone.utc).timestamp())
+    initial = datetime.fromtimestamp(start, tz)
+    lines = ["BEGIN:VTIMEZONE", f"TZID:{key}", *_observance(initial, initial.utcoffset())]
+    for instant in _transitions(tz, start, end):
+        lines += _observance(datetime.fromtimestamp(instant, tz), datetime.fromtimestamp(instant - 1, tz).utcoffset())
+    lines.append("END:VTIMEZONE")
+    return "".join(_fold(line) for line in lines)
+
+
+def calendar_header(name: str) -> str:
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//BrightTimes//Activities//EN",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_escape(name)}",
+    ]
+    return "".join(_fold(line) for line in lines)
+
+
+CALENDAR_FOOTER = "END:VCALENDAR\r\n"
+
+
+def feed_etag(name: str, rows) -> str:
+    # rows are (activity id, updated_at); a feed changes when an activity in it changes, joins or leaves it
+    digest = hashlib.sha256(f"{FEED_FORMAT_VERSION}|{name}".encode())
+    for activity_id, updated_at in rows:
+        digest.update(f"|{activity_id}:{updated_at}".encode())
+    return digest.hexdigest()[:32]
+
+
+class VEventCache:
+    """
+    Rendered VEVENT blocks, keyed by activity id and valid for one updated_at.
+
+    Organizer routes bump updated_at on every change, so a block is re-rendered
+    exactly when its activity changed, in any worker. forget() only frees memory.
+    """
+
+    def __init__(self, max_events=ICAL_CACHE_MAX_EVENTS):
+        self.max_events = max_events
+        self._blocks = OrderedDict()  # activity id -> (updated_at, block)
+        self._lock = threading.Lock()
+
+    def get(self, activity_id: int, updated_at) -> str | None:
+        with self._lock:
+            entry = self._blocks.get(activity_id)
+            block = entry[1] if entry is not None and entry[0] == updated_at else None
+            if block is not None:
+                self._blocks.move_to_end(activity_id)
+        record_cache_lookup("vevent", block is not None)
+        return block
+
+    def put(self, activity_id: int, updated_at, block: str):
+        with self._lock:
+            self._blocks[activity_id] = (updated_at, block)
+            self._blocks.move_to_end(activity_id)
+            while len(self._blocks) > self.max_events:
+                self._blocks.popitem(last=False)
+
+    def forget(self, activity_id: int):
+        with self._lock:
+            self._blocks.pop(activity_id, None)
+
+
+vevent_cache = VEventCache()
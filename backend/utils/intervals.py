@@ -0,0 +1,93 @@
+from bisect import bisect_right
+from datetime import timedelta
+from sqlalchemy import or_
+from models import Activity
+from utils.recurrence import Occurrence, expand, expansion_end, horizon, load_exceptions
+from utils.timezones import to_zone
+from config import MAX_ACTIVITY_HOURS
+
+MAX_ACTIVITY_DURATION = timedelta(hours=MAX_ACTIVITY_HOURS)
+
+
+def check_duration(starts_at, ends_at):
+    if not timedelta(0) < ends_at - starts_at <= MAX_ACTIVITY_DURATION:
+        raise ValueError(f"Duration must be more than 0 and at most {MAX_ACTIVITY_HOURS:g} hours")
+
+
+def overlapping(session, query, start, end) -> list:
+    """
+    Occurrences of query's activities that overlap [start, end), ordered by start.
+
+    Anything overlapping starts less than MAX_ACTIVITY_DURATION before start, so single
+    activities are found with a bounded range scan on a starts_at index instead of a
+    scan of everything that ends after start. Series are expanded over the same range.
+    """
+    earliest = start - MAX_ACTIVITY_DURATION
+    singles = query.filter(
+        Activity.recurrence.is_(None),
+        Activity.starts_at > earliest,
+        Activity.starts_at < end,
+        Activity.ends_at > start,
+    )
+    series = query.filter(
+        Activity.recurrence.isnot(None),
+        Activity.starts_at < end,
+        or_(Activity.recurrence_ends_at.is_(None), Activity.recurrence_ends_at > earliest),
+    ).all()
+    exceptions = load_exceptions(session, [activity.id for activity in series])
+
+    found = [Occurrence.single(activity) for activity in singles]
+    for activity in series:
+        found.extend(
+            occurrence for occurrence in expand(activity, earliest, end, exceptions.get(activity.id))
+            if occurrence.ends_at > start
+        )
+    return sorted(found, key=lambda occurrence: occurrence.sort_key)
+
+
+def scheduled_intervals(activity, now, exceptions=None) -> list:
+    # (starts_at, ends_at) of a single activity, or of a series' occurrences from now on.
+    # Open-ended series are checked for the horizon's length from their first occurrence
+    if not activity.recurrence:
+        return [(activity.starts_at, activity.ends_at)]
+    start = max(now, activity.starts_at)
+    return [
+        (occurrence.starts_at, occurrence.ends_at)
+        for occurrence in expand(activity, start, expansion_end(activity, horizon(start)), exceptions)
+    ]
+
+
+def find_conflicts(session, organizer_id: int, intervals: list, exclude_id: int | None = None,
+                   exclude_occurrence: tuple | None = None) -> list:
+    """
+    The organizer's occurrences overlapping any of intervals, a start-ordered list of equally long (start, end).
+
+    exclude_id leaves out a whole activity, exclude_occurrence one (activity id, original start) of a series.
+    """
+    if not intervals:
+        return []
+    query = session.query(Activity).filter(Activity.organizer_id == organizer_id)
+    if exclude_id is not None:
+        query = query.filter(Activity.id != exclude_id)
+
+    ends = [end for _, end in intervals]
+    conflicts = []
+    for occurrence in overlapping(session, query, intervals[0][0], ends[-1]):
+        if (occurrence.activity.id, occurrence.original_start) == exclude_occurrence:
+            continue
+        # The first interval ending after this occurrence starts is the only one that can overlap it first
+        index = bisect_right(ends, occurrence.starts_at)
+        if index < len(intervals) and intervals[index][0] < occurrence.ends_at:
+            conflicts.append(occurrence)
+    return conflicts
+
+
+def describe(occurrence) -> dict:
+    activity = occurrence.activity
+    return {
+        "id": activity.id,
+        "title": activity.title,
+        "startsAt": to_zone(occurrence.starts_at, None),
+        "endsAt": to_zone(occurrence.ends_at, None),
+        "occurrenceStart": to_zone(occurrence.original_start, None),
+    }
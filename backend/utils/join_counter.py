@@ -0,0 +1,221 @@
+import atexit
+import logging
+import threading
+from collections import OrderedDict, defaultdict
+from datetime import datetime
+from sqlalchemy import bindparam, func, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from db import SessionLocal
+from models import Activity, ActivityOccurrence
+from utils.events import event_broker
+from utils.organizer_stats import record_joins
+from utils.recurrence import find_occurrence
+from utils.timezones import to_zone
+from config import JOIN_COUNTS_CACHED, JOIN_FLUSH_SECONDS, JOIN_FLUSH_MAX_PENDING
+
+
+occurrence_table = ActivityOccurrence.__table__
+_UPSERT_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+logger = logging.getLogger(__name__)
+
+
+def _increment_occurrences(connection, clicks: dict):
+    # clicks maps (activity_id, original_start) to new clicks; rows are created on first join
+    if not clicks:
+        return
+    insert = _UPSERT_DIALECTS.get(connection.dialect.name)
+    table = occurrence_table
+    if insert is not None:
+        statement = insert(table).values(
+            activity_id=bindparam("b_id"), original_start=bindparam("b_start"),
+            cancelled=False, total_times_join_pressed=bindparam("b_clicks"),
+        )
+        connection.execute(
+            statement.on_conflict_do_update(
+                index_elements=[table.c.activity_id, table.c.original_start],
+                set_={"total_times_join_pressed": table.c.total_times_join_pressed + statement.excluded.total_times_join_pressed},
+            ),
+            [{"b_id": activity_id, "b_start": start, "b_clicks": count} for (activity_id, start), count in clicks.items()],
+        )
+        return
+    for (activity_id, start), count in clicks.items():
+        result = connection.execute(
+            update(table)
+            .where(table.c.activity_id == activity_id, table.c.original_start == start)
+            .values(total_times_join_pressed=table.c.total_times_join_pressed + count)
+        )
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(
+                activity_id=activity_id, original_start=start, cancelled=False, total_times_join_pressed=count,
+            ))
+
+
+class JoinCounter:
+    """
+    Write-behind aggregator for Activity.total_times_join_pressed.
+
+    Clicks are summed per activity in memory and written as atomic
+    `SET total = total + N` updates in a single transaction, so a burst of
+    clicks costs one write instead of one transaction per click. Clicks on an
+    occurrence of a series also go to its activity_occurrences row.
+    """
+
+    def __init__(self, flush_interval=JOIN_FLUSH_SECONDS, max_pending=JOIN_FLUSH_MAX_PENDING,
+                 max_stored=JOIN_COUNTS_CACHED):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_stored = max_stored
+        self._pending = defaultdict(int)  # (activity_id, occurrence) -> clicks not yet written
+        self._pending_total = 0
+        self._stored = OrderedDict()  # (activity_id, occurrence) -> last count read, least recently joined first
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def record(self, activity_id: int, occurrence: datetime | None = None) -> int | None:
+        """
+        Count one click and return the approximate live total, or None if the activity doesn't exist.
+
+        occurrence (an original start) counts the click for one occurrence of a series,
+        as well as for the series as a whole.
+        """
+        key = (activity_id, occurrence)
+        if key not in self._stored:
+            stored = self._load(activity_id, occurrence)
+            if stored is None:
+                return None
+            with self._lock:
+                self._store(key, self._stored.get(key, stored))
+
+        with self._lock:
+            self._pending[key] += 1
+            self._pending_total += 1
+            count = self._stored.get(key, 0) + self._pending[key]
+            should_flush = self._pending_total >= self.max_pending
+
+        self._ensure_thread()
+        if should_flush:
+            self.flush()
+        return count
+
+    def _store(self, key, count: int):
+        # Called with the lock held; an evicted total is simply read again on the next click
+        self._stored[key] = count
+        self._stored.move_to_end(key)
+        while len(self._stored) > self.max_stored:
+            self._stored.popitem(last=False)
+
+    def _load(self, activity_id, occurrence):
+        with SessionLocal() as session:
+            if occurrence is None:
+                row = session.query(Activity.total_times_join_pressed).filter_by(id=activity_id).first()
+                return None if row is None else row[0] or 0
+            activity = session.get(Activity, activity_id)
+            found = find_occurrence(session, activity, occurrence) if activity is not None else None
+            return None if found is None else found.joins
+
+    def forget(self, activity_id: int):
+        # Called when an activity is deleted, pending clicks for it are dropped
+        with self._lock:
+            for key in [key for key in self._pending if key[0] == activity_id]:
+                self._pending_total -= self._pending.pop(key)
+            for key in [key for key in self._stored if key[0] == activity_id]:
+                del self._stored[key]
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                batch = dict(self._pending)
+                self._pending.clear()
+                self._pending_total = 0
+            if not batch:
+                return
+
+            # Series totals include their occurrences' clicks
+            per_activity = defaultdict(int)
+            for (activity_id, _), clicks in batch.items():
+                per_activity[activity_id] += clicks
+            per_occurrence = {key: clicks for key, clicks in batch.items() if key[1] is not None}
+
+            table = Activity.__table__
+            statement = (
+                update(table)
+                .where(table.c.id == bindparam("b_id"))
+                .values(total_times_join_pressed=func.coalesce(table.c.total_times_join_pressed, 0) + bindparam("b_clicks"))
+            )
+            try:
+                with SessionLocal() as session:
+                    connection = session.connection()
+                    connection.execute(
+                        statement, [{"b_id": activity_id, "b_clicks": clicks} for activity_id, clicks in per_activity.items()]
+                    )
+                    # Clicks on activities another worker deleted meanwhile are dropped, so they
+                    # leave no orphaned occurrence rows; the update above holds their row locks
+                    existing = set(connection.execute(select(table.c.id).where(table.c.id.in_(list(per_activity)))).scalars())
+                    per_occurrence = {key: clicks for key, clicks in per_occurrence.items() if key[0] in existing}
+                    _increment_occurrences(connection, per_occurrence)
+                    if existing:
+                        record_joins(connection, {key: clicks for key, clicks in per_activity.items() if key in existing})
+                    session.commit()
+                    # Re-read so counts written by other workers show up too
+                    stored = {
+                        (activity_id, None): count or 0
+                        for activity_id, count in session.query(Activity.id, Activity.total_times_join_pressed)
+                        .filter(Activity.id.in_(per_activity.keys()))
+                    }
+                    if per_occurrence:
+                        occurrences = occurrence_table.c
+                        stored.update({
+                            (activity_id, original_start): count
+                            for activity_id, original_start, count in session.execute(
+                                select(occurrences.activity_id, occurrences.original_start, occurrences.total_times_join_pressed)
+                                .where(tuple_(occurrences.activity_id, occurrences.original_start).in_(list(per_occurrence)))
+                            )
+                        })
+            except Exception as e:
+                logger.warning("Error flushing join counts: %s", e)
+                with self._lock:
+                    for key, clicks in batch.items():
+                        self._pending[key] += clicks
+                        self._pending_total += clicks
+                return
+
+            with self._lock:
+                for key in batch:
+                    if key in stored:
+                        self._store(key, stored[key])
+                    else:
+                        self._stored.pop(key, None)
+
+            # One event per flush carries every changed count
+            changed = [
+                {"id": activity_id, "occurrenceStart": to_zone(occurrence, None), "totalTimesJoinPressed": count}
+                for (activity_id, occurrence), count in stored.items()
+                if (activity_id, occurrence) in batch
+            ]
+            if changed:
+                event_broker.publish("joins", changed)
+
+    def _ensure_thread(self):
+        # Started lazily so forked server workers each get their own flusher
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="join-counter-flush", daemon=True)
+            self._thread.start()
+            atexit.register(self.shutdown)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def shutdown(self):
+        self._stop.set()
+        self.flush()
+
+
+join_counter = JoinCounter()
@@ -1,16 +1,16 @@
 import re
 
+# General URL validation
+GENERAL_PATTERN = re.compile(
+    r'^(https?:\/\/)'              # http:// or https://
+    r'([\w\-]+\.)+[a-zA-Z]{2,}'    # domain name
+    r'(\/[\w\-._~:/?#[\]@!$&\'()*+,;=]*)?$'  # optional path/query/fragment
+)
+
+# Platform restriction: only allow Zoom or Google Meet
+ALLOWED_PLATFORM_PATTERN = re.compile(
+    r'^https:\/\/(zoom\.us|meet\.google\.com)\/'
+)
+
 def is_valid_link(link: str) -> bool:
-    # General URL validation
-    general_pattern = re.compile(
-        r'^(https?:\/\/)'              # http:// or https://
-        r'([\w\-]+\.)+[a-zA-Z]{2,}'    # domain name
-        r'(\/[\w\-._~:/?#[\]@!$&\'()*+,;=]*)?$'  # optional path/query/fragment
-    )
-    
-    # Platform restriction: only allow Zoom or Google Meet
-    allowed_platform_pattern = re.compile(
-        r'^https:\/\/(zoom\.us|meet\.google\.com)\/'
-    )
-    
-    return bool(general_pattern.match(link)) and bool(allowed_platform_pattern.match(link))
+    return bool(GENERAL_PATTERN.match(link)) and bool(ALLOWED_PLATFORM_PATTERN.match(link))
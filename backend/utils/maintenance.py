@@ -0,0 +1,183 @@
+import atexit
+import threading
+from datetime import timedelta
+from sqlalchemy import DateTime, and_, delete, insert, literal, or_, select, text, update
+from sqlalchemy.exc import IntegrityError
+from db import SessionLocal, engine
+from models import Activity, ActivityEvent, ActivityOccurrence, ArchivedActivity, MaintenanceRun, TokenBlocklist
+from utils.join_counter import join_counter
+from utils.response_cache import response_cache
+from utils.timezones import utc_now
+from config import ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE, EVENTS_RETENTION_SECONDS, MAINTENANCE_INTERVAL_SECONDS
+
+JOB_NAME = "maintenance"
+# Refresh tokens live 7 days; revocations stored before expires_at existed are kept a day longer
+LEGACY_REVOCATION_DAYS = 8
+ARCHIVED_COLUMNS = [column.name for column in ArchivedActivity.__table__.columns if column.name != "archived_at"]
+
+
+def _archivable(cutoff):
+    # Single activities that started before cutoff, and bounded series whose last occurrence did.
+    # Open-ended series always have occurrences ahead and are never archived
+    return or_(
+        and_(Activity.recurrence.is_(None), Activity.starts_at < cutoff),
+        and_(Activity.recurrence.isnot(None), Activity.recurrence_ends_at < cutoff),
+    )
+
+
+def archive_activities(now=None, batch_size=ARCHIVE_BATCH_SIZE) -> int:
+    """Move activities past the retention window to archived_activities. Returns how many were moved."""
+    now = now or utc_now()
+    cutoff = now - timedelta(days=ARCHIVE_AFTER_DAYS)
+    activities = Activity.__table__
+    moved_ids, organizer_ids = [], set()
+
+    # One transaction per batch keeps write locks short
+    while True:
+        with SessionLocal() as session:
+            rows = session.execute(
+                select(activities.c.id, activities.c.organizer_id).where(_archivable(cutoff)).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            ids = [row.id for row in rows]
+            session.execute(
+                insert(ArchivedActivity.__table__).from_select(
+                    ARCHIVED_COLUMNS + ["archived_at"],
+                    select(*[activities.c[name] for name in ARCHIVED_COLUMNS], literal(now, DateTime))
+                    .where(activities.c.id.in_(ids)),
+                )
+            )
+            # Series totals already include their occurrences' joins
+            session.execute(delete(ActivityOccurrence).where(ActivityOccurrence.activity_id.in_(ids)))
+            session.execute(delete(activities).where(activities.c.id.in_(ids)))
+            session.commit()
+        moved_ids.extend(ids)
+        organizer_ids.update(row.organizer_id for row in rows)
+        if len(rows) < batch_size:
+            break
+
+    for activity_id in moved_ids:
+        join_counter.forget(activity_id)
+    if moved_ids:
+        response_cache.invalidate(
+            "activities",
+            *(f"organizer:{organizer_id}" for organizer_id in organizer_ids),
+            *(f"activity:{activity_id}" for activity_id in moved_ids),
+        )
+    return len(moved_ids)
+
+
+def prune_revocations(now=None) -> int:
+    """Delete blocklist rows whose tokens have expired and can no longer be presented."""
+    now = now or utc_now()
+    with SessionLocal() as session:
+        result = session.execute(
+            delete(TokenBlocklist).where(or_(
+                TokenBlocklist.expires_at < now,
+                and_(
+                    TokenBlocklist.expires_at.is_(None),
+                    TokenBlocklist.created_at < (now - timedelta(days=LEGACY_REVOCATION_DAYS)).date(),
+                ),
+            ))
+        )
+        session.commit()
+        return result.rowcount
+
+
+def prune_events(now=None) -> int:
+    """Delete live-update events older than the Last-Event-ID resume window."""
+    now = now or utc_now()
+    with SessionLocal() as session:
+        result = session.execute(
+            delete(ActivityEvent).where(ActivityEvent.created_at < now - timedelta(seconds=EVENTS_RETENTION_SECONDS))
+        )
+        session.commit()
+        return result.rowcount
+
+
+def optimize_database():
+    # Hand pages freed by the deletes back to the filesystem and refresh planner statistics.
+    # PostgreSQL's autovacuum reclaims space on its own, so only statistics are refreshed there
+    if engine.dialect.name == "sqlite":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.execute(text("PRAGMA incremental_vacuum"))
+            connection.execute(text("ANALYZE"))
+    elif engine.dialect.name == "postgresql":
+        with engine.begin() as connection:
+            for table in (Activity.__table__, ArchivedActivity.__table__, TokenBlocklist.__table__):
+                connection.execute(text(f"ANALYZE {table.name}"))
+
+
+def _claim(now, interval: float) -> bool:
+    # Only the worker whose conditional update succeeds runs the job this interval
+    table = MaintenanceRun.__table__
+    with SessionLocal() as session:
+        if session.get(MaintenanceRun, JOB_NAME) is None:
+            session.add(MaintenanceRun(name=JOB_NAME, last_run_at=None))
+            try:
+                session.commit()
+            except IntegrityError:
+                session.rollback()  # another worker created it first
+        result = session.execute(
+            update(table)
+            .where(
+                table.c.name == JOB_NAME,
+                or_(table.c.last_run_at.is_(None), table.c.last_run_at <= now - timedelta(seconds=interval)),
+            )
+            .values(last_run_at=now)
+        )
+        session.commit()
+        return result.rowcount == 1
+
+
+def run_maintenance(force=False, interval=MAINTENANCE_INTERVAL_SECONDS) -> dict | None:
+    """
+    Archive old activities, prune expired revocations and old events, and optimize the database.
+
+    Returns what was done, or None when another worker already ran within interval
+    (force skips that check).
+    """
+    now = utc_now()
+    if not force and not _claim(now, interval):
+        return None
+    result = {
+        "archived": archive_activities(now),
+        "revocationsPruned": prune_revocations(now),
+        "eventsPruned": prune_events(now),
+    }
+    optimize_database()
+    return result
+
+
+class Maintenance:
+    """Runs run_maintenance every interval seconds in a background thread."""
+
+    def __init__(self, interval=MAINTENANCE_INTERVAL_SECONDS):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def ensure_thread(self):
+        # Started lazily so forked server workers each get their own thread
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="maintenance", daemon=True)
+            self._thread.start()
+            atexit.register(self._stop.set)
+
+    def _run(self):
+        while True:
+            try:
+                run_maintenance(interval=self.interval)
+            except Exception as e:
+                print(f"Error running maintenance: {e}")
+            if self._stop.wait(self.interval):
+                return
+
+
+maintenance = Maintenance()
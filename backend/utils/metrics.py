@@ -0,0 +1,182 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict, deque
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from config import SLOW_QUERY_MS, SLOW_REQUEST_QUERIES
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SLOW_QUERY_LOG_SIZE = 100
+
+logger = logging.getLogger(__name__)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+class Metrics:
+    """
+    Counters and histograms for this worker process, rendered in Prometheus text format.
+
+    Each worker keeps its own numbers; Prometheus sums them across scrape targets.
+    """
+
+    def __init__(self):
+        self._families = {}  # name -> (type, help, buckets)
+        self._counters = defaultdict(float)  # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> [per-bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str):
+        self._families[name] = ("counter", help_text, None)
+
+    def histogram(self, name: str, help_text: str, buckets):
+        self._families[name] = ("histogram", help_text, tuple(buckets))
+
+    def inc(self, name: str, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] += amount
+
+    def observe(self, name: str, value: float, **labels):
+        buckets = self._families[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(buckets), 0.0, 0]
+            index = bisect_left(buckets, value)
+            if index < len(buckets):
+                histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def render(self) -> str:
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: [list(h[0]), h[1], h[2]] for key, h in self._histograms.items()}
+
+        lines = []
+        for name, (kind, help_text, buckets) in self._families.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "counter":
+                for (family, labels), value in sorted(counters.items()):
+                    if family == name:
+                        lines.append(f"{name}{_format_labels(labels)} {value:g}")
+                continue
+            for (family, labels), (counts, total, count) in sorted(histograms.items()):
+                if family != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', f'{bound:g}'),))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {total:g}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+metrics.counter("brighttimes_requests_total", "HTTP requests by endpoint, method and status.")
+metrics.histogram("brighttimes_request_duration_seconds", "Time to produce a response, by endpoint.", LATENCY_BUCKETS)
+metrics.histogram("brighttimes_request_queries", "SQL statements executed per request, by endpoint.", QUERY_COUNT_BUCKETS)
+metrics.counter("brighttimes_sql_queries_total", "SQL statements executed, by endpoint.")
+metrics.counter("brighttimes_sql_seconds_total", "Time spent executing SQL statements, by endpoint.")
+metrics.counter("brighttimes_slow_queries_total", f"SQL statements slower than {SLOW_QUERY_MS} ms, by endpoint.")
+metrics.counter("brighttimes_rate_limited_total", "Requests rejected by the rate limiter, by endpoint.")
+metrics.counter("brighttimes_cache_requests_total", "In-process cache lookups, by cache and hit/miss.")
+
+# Most recent slow statements, newest last
+slow_queries = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+
+
+def _endpoint() -> str:
+    if not has_request_context():
+        return "background"
+    return request.endpoint or "unmatched"
+
+
+def _record_query(statement: str, seconds: float):
+    endpoint = _endpoint()
+    if has_request_context() and "sql_queries" in g:
+        g.sql_queries += 1
+        g.sql_seconds += seconds
+    else:
+        metrics.inc("brighttimes_sql_queries_total", endpoint=endpoint)
+        metrics.inc("brighttimes_sql_seconds_total", seconds, endpoint=endpoint)
+
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        metrics.inc("brighttimes_slow_queries_total", endpoint=endpoint)
+        slow_queries.append({"endpoint": endpoint, "ms": round(seconds * 1000, 1), "statement": statement})
+        logger.warning("Slow query (%.1f ms) in %s: %s", seconds * 1000, endpoint, " ".join(statement.split())[:500])
+
+
+def instrument_engine(engine):
+    """Time every SQL statement and attribute it to the current request's endpoint."""
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        _record_query(statement, time.perf_counter() - conn.info["query_started"].pop())
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+        if started:
+            started.pop()
+
+
+def _before_request():
+    g.request_started = time.perf_counter()
+    g.sql_queries = 0
+    g.sql_seconds = 0.0
+
+
+def _after_request(response):
+    if "request_started" not in g:
+        return response
+    endpoint = _endpoint()
+    elapsed = time.perf_counter() - g.request_started
+    metrics.inc("brighttimes_requests_total", endpoint=endpoint, method=request.method, status=response.status_code)
+    metrics.observe("brighttimes_request_duration_seconds", elapsed, endpoint=endpoint, method=request.method)
+    metrics.observe("brighttimes_request_queries", g.sql_queries, endpoint=endpoint)
+    metrics.inc("brighttimes_sql_queries_total", g.sql_queries, endpoint=endpoint)
+    metrics.inc("brighttimes_sql_seconds_total", g.sql_seconds, endpoint=endpoint)
+    if g.sql_queries >= SLOW_REQUEST_QUERIES:
+        # Usually an N+1 pattern: one statement per row instead of a join
+        logger.warning(
+            "%s %s ran %d SQL statements (%.1f ms)", request.method, request.path, g.sql_queries, g.sql_seconds * 1000
+        )
+    # Statements run while a streamed body is generated are counted outside the request
+    del g.sql_queries
+    return response
+
+
+def instrument_app(app, engine):
+    """Record latency and SQL usage for every request handled by app."""
+    instrument_engine(engine)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+
+
+def record_rate_limited(request_limit):
+    # Flask-Limiter on_breach callback
+    metrics.inc("brighttimes_rate_limited_total", endpoint=_endpoint())
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    metrics.inc("brighttimes_cache_requests_total", cache=cache, result="hit" if hit else "miss")
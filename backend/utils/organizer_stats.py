@@ -0,0 +1,136 @@
+from sqlalchemy import func, update, bindparam, select
+from sqlalchemy.dialects import sqlite, postgresql
+from sqlalchemy.exc import IntegrityError
+from models import Activity, ArchivedActivity, OrganizerStats, OrganizerTopicCount
+
+_UPSERT_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def ensure_stats(session, organizer_id: int):
+    """
+    Make sure the organizer has a stats row, computing it from activities the first time.
+
+    Call this before changing the organizer's activities in the same session, so
+    the following increments apply on top of an up-to-date baseline.
+    """
+    if session.get(OrganizerStats, organizer_id) is not None:
+        return
+    # Archived activities still count towards the organizer's history
+    total_activities, total_joins, topic_counts = 0, 0, {}
+    for model in (Activity, ArchivedActivity):
+        activities, joins = session.query(
+            func.count(model.id), func.coalesce(func.sum(model.total_times_join_pressed), 0)
+        ).filter(model.organizer_id == organizer_id).one()
+        total_activities += activities
+        total_joins += joins
+        for topic, count in (
+            session.query(model.topic, func.count(model.id))
+            .filter(model.organizer_id == organizer_id)
+            .group_by(model.topic)
+        ):
+            topic_counts[topic] = topic_counts.get(topic, 0) + count
+    values = {
+        "organizer_id": organizer_id,
+        "total_activities": total_activities,
+        "total_times_join_pressed": total_joins,
+    }
+    # A concurrent first write may have stored the baseline already, keep that one
+    insert = _UPSERT_DIALECTS.get(session.get_bind().dialect.name)
+    if insert is not None:
+        result = session.execute(
+            insert(OrganizerStats.__table__).values(**values).on_conflict_do_nothing(index_elements=["organizer_id"])
+        )
+        if result.rowcount == 0:
+            return
+    else:
+        try:
+            with session.begin_nested():
+                session.add(OrganizerStats(**values))
+        except IntegrityError:
+            return
+    for topic, count in topic_counts.items():
+        session.add(OrganizerTopicCount(organizer_id=organizer_id, topic=topic, count=count))
+    session.flush()
+
+
+def _increment_topic(session, organizer_id: int, topic: str, delta: int):
+    insert = _UPSERT_DIALECTS.get(session.get_bind().dialect.name)
+    table = OrganizerTopicCount.__table__
+    if insert is not None:
+        statement = insert(table).values(organizer_id=organizer_id, topic=topic, count=delta)
+        session.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.organizer_id, table.c.topic],
+            set_={"count": table.c.count + delta},
+        ))
+        return
+    result = session.execute(
+        update(table)
+        .where(table.c.organizer_id == organizer_id, table.c.topic == topic)
+        .values(count=table.c.count + delta)
+    )
+    if result.rowcount == 0:
+        session.add(OrganizerTopicCount(organizer_id=organizer_id, topic=topic, count=delta))
+
+
+def _increment_totals(session, organizer_id: int, activities=0, joins=0):
+    table = OrganizerStats.__table__
+    session.execute(
+        update(table)
+        .where(table.c.organizer_id == organizer_id)
+        .values(
+            total_activities=table.c.total_activities + activities,
+            total_times_join_pressed=table.c.total_times_join_pressed + joins,
+        )
+    )
+
+
+def record_activity_added(session, organizer_id: int, topic: str):
+    _increment_totals(session, organizer_id, activities=1)
+    _increment_topic(session, organizer_id, topic, 1)
+
+
+def record_activities_added(session, organizer_id: int, topic_counts: dict):
+    # Batched variant for bulk imports: topic -> number of new activities
+    _increment_totals(session, organizer_id, activities=sum(topic_counts.values()))
+    for topic, count in topic_counts.items():
+        _increment_topic(session, organizer_id, topic, count)
+
+
+def record_activity_removed(session, organizer_id: int, topic: str, times_join_pressed: int):
+    _increment_totals(session, organizer_id, activities=-1, joins=-(times_join_pressed or 0))
+    _increment_topic(session, organizer_id, topic, -1)
+
+
+def record_topic_changed(session, organizer_id: int, old_topic: str, new_topic: str):
+    if old_topic != new_topic:
+        _increment_topic(session, organizer_id, old_topic, -1)
+        _increment_topic(session, organizer_id, new_topic, 1)
+
+
+def record_joins(connection, clicks_by_activity: dict):
+    # Used by the join counter flush, in the same transaction as the activity updates
+    table = OrganizerStats.__table__
+    owner = select(Activity.organizer_id).where(Activity.id == bindparam("b_id")).scalar_subquery()
+    connection.execute(
+        update(table)
+        .where(table.c.organizer_id == owner)
+        .values(total_times_join_pressed=table.c.total_times_join_pressed + bindparam("b_clicks")),
+        [{"b_id": activity_id, "b_clicks": clicks} for activity_id, clicks in clicks_by_activity.items()],
+    )
+
+
+def get_stats(session, organizer_id: int) -> dict:
+    ensure_stats(session, organizer_id)
+    stats = session.get(OrganizerStats, organizer_id)
+    specialties = (
+        session.query(OrganizerTopicCount.topic)
+        .filter(OrganizerTopicCount.organizer_id == organizer_id, OrganizerTopicCount.count > 0)
+        .order_by(OrganizerTopicCount.count.desc(), OrganizerTopicCount.topic)
+        .limit(5)
+        .all()
+    )
+    return {
+        "totalActivities": stats.total_activities,
+        "totalTimesJoinPressed": stats.total_times_join_pressed,
+        "specialties": [topic for (topic,) in specialties],
+    }
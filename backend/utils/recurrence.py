@@ -0,0 +1,441 @@
+import heapq
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from itertools import count as counter
+from sqlalchemy import and_, func, or_, tuple_
+from models import Activity, ActivityOccurrence
+from utils.timezones import parse_duration, resolve_timezone, utc_now
+from config import RECURRENCE_HORIZON_DAYS
+
+WEEKDAYS = ["MO", "TU", "WE", "TH", "FR", "SA", "SU"]
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY")
+MAX_OCCURRENCES = 2000
+
+
+@dataclass(frozen=True)
+class Rule:
+    freq: str
+    interval: int = 1
+    by_day: tuple = ()  # weekday numbers, Monday=0, WEEKLY only
+    count: int | None = None
+    until: date | None = None  # last local date, inclusive
+
+
+def parse_rule(value: str) -> Rule:
+    """
+    Parse the supported RRULE subset: FREQ=DAILY|WEEKLY|MONTHLY with optional
+    INTERVAL, BYDAY (weekly) and either COUNT or UNTIL (a date).
+    """
+    parts = {}
+    for part in value.strip().upper().removeprefix("RRULE:").split(";"):
+        if not part:
+            continue
+        key, separator, part_value = part.partition("=")
+        if not separator:
+            raise ValueError(f"Invalid recurrence part: {part}")
+        parts[key.strip()] = part_value.strip()
+
+    freq = parts.pop("FREQ", None)
+    if freq not in FREQUENCIES:
+        raise ValueError("Recurrence FREQ must be DAILY, WEEKLY or MONTHLY")
+    interval = int(parts.pop("INTERVAL", "1"))
+    if interval < 1:
+        raise ValueError("Recurrence INTERVAL must be at least 1")
+
+    by_day = ()
+    if "BYDAY" in parts:
+        if freq != "WEEKLY":
+            raise ValueError("Recurrence BYDAY is only supported with FREQ=WEEKLY")
+        days = parts.pop("BYDAY").split(",")
+        if any(day not in WEEKDAYS for day in days):
+            raise ValueError("Recurrence BYDAY takes MO, TU, WE, TH, FR, SA, SU")
+        by_day = tuple(sorted({WEEKDAYS.index(day) for day in days}))
+
+    count = int(parts.pop("COUNT")) if "COUNT" in parts else None
+    if count is not None and not 1 <= count <= MAX_OCCURRENCES:
+        raise ValueError(f"Recurrence COUNT must be between 1 and {MAX_OCCURRENCES}")
+    until = None
+    if "UNTIL" in parts:
+        raw = parts.pop("UNTIL")
+        until = datetime.strptime(raw[:8], "%Y%m%d").date() if raw[:8].isdigit() else date.fromisoformat(raw[:10])
+    if count is not None and until is not None:
+        raise ValueError("Recurrence can't have both COUNT and UNTIL")
+
+    if parts:
+        raise ValueError(f"Unsupported recurrence parts: {', '.join(sorted(parts))}")
+    return Rule(freq, interval, by_day, count, until)
+
+
+def format_rule(rule: Rule) -> str:
+    parts = [f"FREQ={rule.freq}"]
+    if rule.interval != 1:
+        parts.append(f"INTERVAL={rule.interval}")
+    if rule.by_day:
+        parts.append("BYDAY=" + ",".join(WEEKDAYS[day] for day in rule.by_day))
+    if rule.count is not None:
+        parts.append(f"COUNT={rule.count}")
+    if rule.until is not None:
+        parts.append(f"UNTIL={rule.until:%Y%m%d}")
+    return ";".join(parts)
+
+
+def _add_months(day: date, months: int) -> date | None:
+    month_index = day.month - 1 + months
+    try:
+        return day.replace(year=day.year + month_index // 12, month=month_index % 12 + 1)
+    except ValueError:
+        return None  # e.g. the 31st in a shorter month, which RRULE skips
+
+
+def _local_dates(rule: Rule, first: date, not_before: date | None = None):
+    # Candidate dates in order. Without COUNT, whole periods before not_before are skipped arithmetically
+    skip = 0
+    if not_before is not None and rule.count is None and not_before > first:
+        if rule.freq == "DAILY":
+            skip = (not_before - first).days // rule.interval
+        elif rule.freq == "WEEKLY":
+            skip = max(0, (not_before - first).days // (7 * rule.interval) - 1)
+        else:
+            months = (not_before.year - first.year) * 12 + not_before.month - first.month
+            skip = max(0, months // rule.interval - 1)
+
+    week_start = first - timedelta(days=first.weekday())
+    for period in counter(skip):
+        if rule.freq == "DAILY":
+            yield first + timedelta(days=period * rule.interval)
+        elif rule.freq == "WEEKLY":
+            start = week_start + timedelta(weeks=period * rule.interval)
+            for weekday in rule.by_day or (first.weekday(),):
+                day = start + timedelta(days=weekday)
+                if day >= first:
+                    yield day
+        else:
+            day = _add_months(first, period * rule.interval)
+            if day is not None:
+                yield day
+
+
+def _local_starts(rule: Rule, first: date, activity_time: str, not_before: date | None = None):
+    local_time = datetime.strptime(activity_time, "%H:%M").time()
+    for number, day in enumerate(_local_dates(rule, first, not_before), start=1):
+        if rule.until is not None and day > rule.until:
+            return
+        if rule.count is not None and number > rule.count:
+            return
+        yield datetime.combine(day, local_time)
+
+
+@dataclass
+class Occurrence:
+    """One dated instance of an activity. original_start is None for activities that don't repeat."""
+    activity: Activity
+    original_start: datetime | None
+    starts_at: datetime
+    ends_at: datetime
+    joins: int
+    local_date: date | None = None
+    local_time: str | None = None
+    columns: dict | None = None  # extra values selected with a single activity, by label
+
+    @classmethod
+    def single(cls, activity, columns=None):
+        return cls(
+            activity, None, activity.starts_at, activity.ends_at, activity.total_times_join_pressed or 0,
+            columns=columns,
+        )
+
+    @property
+    def sort_key(self):
+        # Legacy rows whose time couldn't be parsed have no starts_at and sort first
+        return self.starts_at or datetime.min, self.activity.id
+
+
+def _to_utc(local: datetime, tz) -> datetime:
+    return local.replace(tzinfo=tz).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _produces(rule: Rule, activity, tz, original_start: datetime) -> bool:
+    # Whether the rule has an occurrence starting exactly at original_start (naive UTC)
+    day = original_start.replace(tzinfo=timezone.utc).astimezone(tz).date()
+    for local in _local_starts(rule, activity.date, activity.time, day - timedelta(days=1)):
+        if local.date() > day:
+            return False
+        if local.date() == day:
+            return _to_utc(local, tz) == original_start
+    return False
+
+
+def _occurrence(activity, original_start, starts_at, duration, tz, exception=None):
+    ends_at = starts_at + duration
+    if exception is not None and exception.starts_at is not None:
+        starts_at, ends_at = exception.starts_at, exception.ends_at
+    local = starts_at.replace(tzinfo=timezone.utc).astimezone(tz)
+    joins = exception.total_times_join_pressed if exception is not None else 0
+    return Occurrence(activity, original_start, starts_at, ends_at, joins, local.date(), local.strftime("%H:%M"))
+
+
+def expand(activity, start: datetime, end: datetime, exceptions: dict | None = None):
+    """
+    Yield the series' occurrences starting in [start, end), in order, as naive UTC.
+
+    exceptions maps original starts to ActivityOccurrence rows: cancelled
+    occurrences are left out and moved ones appear at their new time. Exceptions
+    for starts the current rule doesn't produce are ignored.
+    """
+    rule = parse_rule(activity.recurrence)
+    tz = resolve_timezone(activity.timezone)
+    duration = parse_duration(activity.duration)
+    exceptions = exceptions or {}
+
+    def regular():
+        # One day of slack either side covers any UTC offset
+        for local in _local_starts(rule, activity.date, activity.time, (start - timedelta(days=1)).date()):
+            original = _to_utc(local, tz)
+            if original >= end:
+                return
+            if original < start:
+                continue
+            exception = exceptions.get(original)
+            if exception is not None and (exception.cancelled or exception.starts_at is not None):
+                continue
+            yield _occurrence(activity, original, original, duration, tz, exception)
+
+    moved = sorted(
+        (
+            _occurrence(activity, original, original, duration, tz, exception)
+            for original, exception in exceptions.items()
+            if not exception.cancelled and exception.starts_at is not None and start <= exception.starts_at < end
+            and _produces(rule, activity, tz, original)
+        ),
+        key=lambda occurrence: occurrence.starts_at,
+    )
+    yield from heapq.merge(regular(), moved, key=lambda occurrence: occurrence.starts_at)
+
+
+def is_occurrence(activity, original_start: datetime) -> bool:
+    """Whether the series' rule has an occurrence originally starting at original_start."""
+    if not activity.recurrence:
+        return False
+    return _produces(parse_rule(activity.recurrence), activity, resolve_timezone(activity.timezone), original_start)
+
+
+def reschedule_exceptions(session, activity, old_timezone: str | None):
+    """
+    Carry a rescheduled series' occurrence rows (cancelled, moved or counted) over to its new rule.
+
+    Each row follows its local date in old_timezone to the new occurrence on that date; rows
+    the new rule has no occurrence for are deleted, all of them when the activity stopped repeating.
+    """
+    rows = session.query(ActivityOccurrence).filter_by(activity_id=activity.id).all()
+    if not rows:
+        return
+    old_tz = resolve_timezone(old_timezone)
+    kept = []
+    duration = parse_duration(activity.duration)
+    if activity.recurrence:
+        rule = parse_rule(activity.recurrence)
+        tz = resolve_timezone(activity.timezone)
+        local_time = datetime.strptime(activity.time, "%H:%M").time()
+        for row in rows:
+            day = row.original_start.replace(tzinfo=timezone.utc).astimezone(old_tz).date()
+            original_start = _to_utc(datetime.combine(day, local_time), tz)
+            if _produces(rule, activity, tz, original_start):
+                kept.append((row, original_start))
+
+    # Deleted and re-added, since the new keys may overlap the old ones
+    for row in rows:
+        session.delete(row)
+    session.flush()
+    for row, original_start in kept:
+        session.add(ActivityOccurrence(
+            activity_id=activity.id,
+            original_start=original_start,
+            cancelled=row.cancelled,
+            starts_at=row.starts_at,
+            ends_at=row.starts_at + duration if row.starts_at is not None else None,
+            total_times_join_pressed=row.total_times_join_pressed,
+        ))
+    session.flush()
+
+
+def series_schedule(activity_date, activity_time: str, duration, tz_name: str | None,
+                    recurrence: str) -> tuple[datetime, datetime, datetime | None]:
+    """Like compute_schedule for a series: the first occurrence, and the UTC start of the last one (None if open-ended)."""
+    rule = parse_rule(recurrence)
+    tz = resolve_timezone(tz_name)
+    starts = _local_starts(rule, activity_date, activity_time)
+    first = next(starts, None)
+    if first is None:
+        raise ValueError("Recurrence has no occurrences")
+    starts_at = _to_utc(first, tz)
+    last = None
+    if rule.count is not None or rule.until is not None:
+        last = first
+        for number, last in enumerate(starts, start=2):
+            if number > MAX_OCCURRENCES:
+                raise ValueError(f"Recurrence can't have more than {MAX_OCCURRENCES} occurrences")
+        last = _to_utc(last, tz)
+    return starts_at, starts_at + parse_duration(duration), last
+
+
+def upcoming_clause(now: datetime):
+    # Single activities that haven't started, and series with occurrences left
+    return or_(
+        and_(Activity.recurrence.is_(None), Activity.starts_at >= now),
+        and_(
+            Activity.recurrence.isnot(None),
+            or_(Activity.recurrence_ends_at.is_(None), Activity.recurrence_ends_at >= now),
+        ),
+    )
+
+
+def series_ends_at(session, activity) -> datetime | None:
+    """recurrence_ends_at for a bounded series, pushed out by any occurrence moved past its last one."""
+    if activity.recurrence_ends_at is None:
+        return None
+    moves = session.query(ActivityOccurrence.original_start, ActivityOccurrence.starts_at).filter(
+        ActivityOccurrence.activity_id == activity.id,
+        ActivityOccurrence.cancelled.is_(False),
+        ActivityOccurrence.starts_at.isnot(None),
+    )
+    rule, tz = parse_rule(activity.recurrence), resolve_timezone(activity.timezone)
+    latest_move = max(
+        (starts_at for original_start, starts_at in moves if _produces(rule, activity, tz, original_start)),
+        default=None,
+    )
+    return max(activity.recurrence_ends_at, latest_move) if latest_move else activity.recurrence_ends_at
+
+
+def horizon(now: datetime | None = None) -> datetime:
+    # Open-ended series are expanded this far ahead
+    return (now or utc_now()) + timedelta(days=RECURRENCE_HORIZON_DAYS)
+
+
+def expansion_end(activity, end: datetime) -> datetime:
+    # Series with a COUNT or UNTIL are expanded in full, open-ended ones only up to end
+    if activity.recurrence_ends_at is not None:
+        return activity.recurrence_ends_at + timedelta(seconds=1)
+    return end
+
+
+def load_exceptions(session, activity_ids) -> dict:
+    """activity id -> {original start: ActivityOccurrence} for the given series."""
+    result = {}
+    if not activity_ids:
+        return result
+    rows = session.query(ActivityOccurrence).filter(ActivityOccurrence.activity_id.in_(activity_ids))
+    for row in rows:
+        result.setdefault(row.activity_id, {})[row.original_start] = row
+    return result
+
+
+def upcoming_occurrences(session, query, start: datetime, end: datetime, after=None):
+    """
+    Occurrences from query's activities starting at or after start, ordered by (starts_at, id).
+
+    Single activities are read lazily with yield_per; series (usually few) are loaded
+    up front and expanded, open-ended ones up to end. after is an exclusive (starts_at, id) keyset cursor.
+    """
+    series = (
+        query.filter(
+            Activity.recurrence.isnot(None),
+            or_(
+                and_(Activity.recurrence_ends_at.is_(None), Activity.starts_at < end),
+                Activity.recurrence_ends_at >= start,
+            ),
+        )
+        .order_by(None)
+        .all()
+    )
+    exceptions = load_exceptions(session, [activity.id for activity in series])
+
+    singles = query.filter(Activity.recurrence.is_(None), Activity.starts_at >= start)
+    if after:
+        singles = singles.filter(tuple_(Activity.starts_at, Activity.id) > after)
+    singles = (Occurrence.single(activity) for activity in singles.order_by(Activity.starts_at, Activity.id).yield_per(200))
+
+    expanded = [
+        expand(activity, start, expansion_end(activity, end), exceptions.get(activity.id)) for activity in series
+    ]
+    merged = heapq.merge(singles, *expanded, key=lambda occurrence: occurrence.sort_key)
+    if after:
+        return (occurrence for occurrence in merged if occurrence.sort_key > after)
+    return merged
+
+
+def organizer_occurrences(session, query, end: datetime, before=None, columns=()):
+    """
+    Every occurrence of query's activities, newest first; open-ended series stop at end.
+
+    before is an exclusive (starts_at, id) keyset cursor for the descending order. The
+    labelled columns are selected along with single activities and set as their
+    Occurrence.columns; occurrences of series have none.
+    """
+    series = query.filter(Activity.recurrence.isnot(None)).order_by(None).all()
+    exceptions = load_exceptions(session, [activity.id for activity in series])
+
+    singles = query.filter(Activity.recurrence.is_(None))
+    if before:
+        singles = singles.filter(tuple_(Activity.starts_at, Activity.id) < before)
+    singles = singles.order_by(Activity.starts_at.desc(), Activity.id.desc())
+    if columns:
+        names = [column.name for column in columns]
+        singles = (
+            Occurrence.single(row[0], dict(zip(names, row[1:])))
+            for row in singles.add_columns(*columns).yield_per(200)
+        )
+    else:
+        singles = (Occurrence.single(activity) for activity in singles.yield_per(200))
+
+    expanded = [
+        list(expand(activity, activity.starts_at, expansion_end(activity, end), exceptions.get(activity.id)))[::-1]
+        for activity in series
+    ]
+    merged = heapq.merge(singles, *expanded, key=lambda occurrence: occurrence.sort_key, reverse=True)
+    if before:
+        return (occurrence for occurrence in merged if occurrence.sort_key < before)
+    return merged
+
+
+def next_occurrence(activity, now: datetime, exceptions: dict | None = None) -> Occurrence | None:
+    if not activity.recurrence:
+        return Occurrence.single(activity)
+    return next(expand(activity, now, expansion_end(activity, horizon(now)), exceptions), None)
+
+
+def with_next_occurrences(session, activities, now: datetime, batch_size=200):
+    """Yield each activity as its next occurrence (itself, unless it repeats), keeping the given order."""
+    batch = []
+    for activity in activities:
+        batch.append(activity)
+        if len(batch) >= batch_size:
+            yield from _next_occurrences(session, batch, now)
+            batch = []
+    yield from _next_occurrences(session, batch, now)
+
+
+def _next_occurrences(session, activities, now):
+    exceptions = load_exceptions(session, [activity.id for activity in activities if activity.recurrence])
+    for activity in activities:
+        occurrence = next_occurrence(activity, now, exceptions.get(activity.id))
+        if occurrence is not None:
+            yield occurrence
+
+
+def parse_occurrence(value: str) -> datetime:
+    # Occurrences are identified by their original start, as ISO 8601; naive values are UTC
+    parsed = datetime.fromisoformat(value.strip())
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def find_occurrence(session, activity, original_start: datetime) -> Occurrence | None:
+    """The series' occurrence with this original start, None if there is none or it was cancelled."""
+    if not is_occurrence(activity, original_start):
+        return None
+    exception = session.get(ActivityOccurrence, (activity.id, original_start))
+    if exception is not None and exception.cancelled:
+        return None
+    tz = resolve_timezone(activity.timezone)
+    return _occurrence(activity, original_start, original_start, parse_duration(activity.duration), tz, exception)
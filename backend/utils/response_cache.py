@@ -0,0 +1,143 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from functools import wraps
+from flask import request, make_response
+from config import RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_TTL_SECONDS
+from utils.metrics import record_cache_lookup
+from utils.streaming import wants_stream
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    mimetype: str
+    etag: str
+    tags: frozenset
+    expires_at: float
+
+
+class ResponseCache:
+    """Size-bounded LRU of response bodies, invalidated by tag."""
+
+    def __init__(self, max_bytes=RESPONSE_CACHE_MAX_BYTES, ttl=RESPONSE_CACHE_TTL_SECONDS):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._keys_by_tag = defaultdict(set)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at < time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        record_cache_lookup("response", entry is not None)
+        return entry
+
+    def put(self, key, body: bytes, mimetype: str, tags) -> CachedResponse:
+        entry = CachedResponse(
+            body=body,
+            mimetype=mimetype,
+            etag=hashlib.sha256(body).hexdigest()[:32],
+            tags=frozenset(tags),
+            expires_at=time.monotonic() + self.ttl,
+        )
+        if len(body) > self.max_bytes:
+            return entry
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._size += len(body)
+            for tag in entry.tags:
+                self._keys_by_tag[tag].add(key)
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+        return entry
+
+    def invalidate(self, *tags):
+        with self._lock:
+            for tag in tags:
+                for key in list(self._keys_by_tag.get(tag, ())):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_tag.clear()
+            self._size = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._size -= len(entry.body)
+        for tag in entry.tags:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+
+response_cache = ResponseCache()
+
+
+def _conditional_response(entry: CachedResponse):
+    if entry.etag in request.if_none_match:
+        response = make_response("", 304)
+    else:
+        response = make_response(entry.body)
+        response.mimetype = entry.mimetype
+    response.set_etag(entry.etag)
+    return response
+
+
+def cached_response(tags_for):
+    """
+    Cache successful responses of a public GET handler, keyed by path and query args.
+
+    tags_for(payload, **view_args) returns the invalidation tags for a response,
+    e.g. "activity:<id>" or "organizer:<id>".
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            # Streamed responses are never buffered, and must not be answered from the JSON cache
+            if wants_stream():
+                return f(*args, **kwargs)
+            key = (request.path, tuple(sorted(request.args.items(multi=True))))
+            entry = response_cache.get(key)
+            if entry is None:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                tags = tags_for(response.get_json(), **kwargs)
+                entry = response_cache.put(key, response.get_data(), response.mimetype, tags)
+            return _conditional_response(entry)
+        return decorated
+    return decorator
+
+
+def activity_tags(activity: dict) -> set:
+    # A ?fields= projection may leave the ids out; list routes are also tagged "activities"
+    tags = set()
+    if "id" in activity:
+        tags.add(f"activity:{activity['id']}")
+    organizer_id = activity.get("organizer_id") or (activity.get("organizer") or {}).get("id")
+    if organizer_id is not None:
+        tags.add(f"organizer:{organizer_id}")
+    return tags
+
+
+def activity_list_tags(payload, **_) -> set:
+    activities = payload["activities"] if isinstance(payload, dict) else payload
+    tags = {"activities"}
+    for activity in activities:
+        tags |= activity_tags(activity)
+    return tags
@@ -0,0 +1,69 @@
+import threading
+import time
+from sqlalchemy import func
+from datetime import datetime, timezone
+from db import SessionLocal
+from models import TokenBlocklist
+from config import REVOCATION_SYNC_SECONDS
+
+
+class RevocationCache:
+    """
+    In-process view of token_blocklist.
+
+    Revoked jtis are kept in memory until their token's exp passes. New rows are
+    pulled incrementally (id > last seen id) at most every sync_interval seconds,
+    so authenticated requests normally never touch the database.
+    """
+
+    def __init__(self, sync_interval=REVOCATION_SYNC_SECONDS):
+        self.sync_interval = sync_interval
+        self._revoked = {}  # jti -> exp as unix timestamp, None if unknown
+        self._last_id = 0
+        self._last_sync = None
+        self._lock = threading.Lock()
+
+    def is_revoked(self, jti: str) -> bool:
+        self._maybe_sync()
+        return jti in self._revoked
+
+    def revoke(self, jti: str, exp: float | None):
+        # Local revocations take effect immediately in this worker
+        with self._lock:
+            self._revoked[jti] = exp
+
+    def _maybe_sync(self):
+        if self._last_sync is not None and time.monotonic() - self._last_sync < self.sync_interval:
+            return
+        with self._lock:
+            if self._last_sync is not None and time.monotonic() - self._last_sync < self.sync_interval:
+                return
+            self._sync()
+            self._last_sync = time.monotonic()
+
+    def _sync(self):
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        with SessionLocal() as session:
+            query = session.query(TokenBlocklist.id, TokenBlocklist.jti, TokenBlocklist.expires_at)
+            if self._last_sync is None:
+                # First load: only tokens that can still be presented
+                self._last_id = session.query(func.max(TokenBlocklist.id)).scalar() or 0
+                rows = query.filter(
+                    TokenBlocklist.expires_at.is_(None) | (TokenBlocklist.expires_at > now)
+                ).all()
+            else:
+                rows = query.filter(TokenBlocklist.id > self._last_id).order_by(TokenBlocklist.id).all()
+
+        for row in rows:
+            exp = row.expires_at.replace(tzinfo=timezone.utc).timestamp() if row.expires_at else None
+            self._revoked[row.jti] = exp
+            self._last_id = max(self._last_id, row.id)
+
+        # Expired tokens are rejected by jwt.decode anyway, so stop tracking them
+        cutoff = now.replace(tzinfo=timezone.utc).timestamp()
+        self._revoked = {
+            jti: exp for jti, exp in self._revoked.items() if exp is None or exp > cutoff
+        }
+
+
+revocation_cache = RevocationCache()
@@ -0,0 +1,78 @@
+import re
+from sqlalchemy import inspect, or_, text, literal_column
+from sqlalchemy.sql import table, column
+from models import Activity
+
+# External-content FTS5 index over the searchable activity fields. Triggers keep it
+# in sync with every write, including ones made by other workers or bulk imports.
+SEARCH_INDEX_DDL = [
+    """
+    CREATE VIRTUAL TABLE activities_fts USING fts5(
+        title, description, materials,
+        content='activities', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER activities_fts_ai AFTER INSERT ON activities BEGIN
+        INSERT INTO activities_fts (rowid, title, description, materials)
+        VALUES (new.id, new.title, new.description, new.materials);
+    END
+    """,
+    """
+    CREATE TRIGGER activities_fts_ad AFTER DELETE ON activities BEGIN
+        INSERT INTO activities_fts (activities_fts, rowid, title, description, materials)
+        VALUES ('delete', old.id, old.title, old.description, old.materials);
+    END
+    """,
+    """
+    CREATE TRIGGER activities_fts_au AFTER UPDATE OF title, description, materials ON activities BEGIN
+        INSERT INTO activities_fts (activities_fts, rowid, title, description, materials)
+        VALUES ('delete', old.id, old.title, old.description, old.materials);
+        INSERT INTO activities_fts (rowid, title, description, materials)
+        VALUES (new.id, new.title, new.description, new.materials);
+    END
+    """,
+]
+
+activities_fts = table("activities_fts", column("rowid"))
+
+
+def ensure_search_index(engine):
+    if engine.dialect.name != "sqlite" or inspect(engine).has_table("activities_fts"):
+        return
+    with engine.begin() as connection:
+        for statement in SEARCH_INDEX_DDL:
+            connection.execute(text(statement))
+        # Index the rows that existed before the search index
+        connection.execute(text("INSERT INTO activities_fts (activities_fts) VALUES ('rebuild')"))
+
+
+def search_terms(q: str) -> list:
+    return re.findall(r"\w+", q)
+
+
+def apply_search(query, q: str):
+    """Restrict an Activity query to matches for q, best matches first."""
+    terms = search_terms(q)
+    if not terms:
+        return query.filter(False)
+
+    if query.session.get_bind().dialect.name == "sqlite":
+        # Quote every term so user input can't inject FTS syntax; the last one matches as a prefix
+        match = " ".join(f'"{term}"' for term in terms) + "*"
+        return (
+            query.join(activities_fts, activities_fts.c.rowid == Activity.id)
+            .filter(text("activities_fts MATCH :search_match").bindparams(search_match=match))
+            .order_by(literal_column("activities_fts.rank"), Activity.id)
+        )
+
+    # Other databases: every term has to appear in one of the searchable fields
+    for term in terms:
+        pattern = f"%{term}%"
+        query = query.filter(or_(
+            Activity.title.ilike(pattern),
+            Activity.description.ilike(pattern),
+            Activity.materials.ilike(pattern),
+        ))
+    return query.order_by(Activity.starts_at, Activity.id)
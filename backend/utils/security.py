@@ -1,16 +1,85 @@
 import hashlib
+import hmac
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import PASSWORD_HASH_ITERATIONS, PASSWORD_POOL_WORKERS, PASSWORD_POOL_MAX_QUEUE
 
-def hash_password(password: str) -> str:
+ALGORITHM = "pbkdf2_sha256"
+LEGACY_ITERATIONS = 100000  # hashes stored as "salt:hash" before parameters were recorded
+
+
+class PasswordPoolBusy(Exception):
+    """Raised when too many password hashes are already queued."""
+
+
+class PasswordHasherPool:
+    """
+    Bounded worker pool for PBKDF2.
+
+    hashlib.pbkdf2_hmac releases the GIL, so dedicated threads hash in parallel
+    while request threads keep serving other endpoints. At most
+    max_workers + max_queue jobs are accepted at once; anything beyond that
+    raises PasswordPoolBusy instead of piling up behind a login burst.
+    """
+
+    def __init__(self, max_workers=PASSWORD_POOL_WORKERS, max_queue=PASSWORD_POOL_MAX_QUEUE):
+        self.max_workers = max_workers
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Recreate the pool after a fork so each server worker owns its threads
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="pbkdf2")
+                self._pid = os.getpid()
+            return self._executor
+
+    def pbkdf2(self, password: str, salt: bytes, iterations: int) -> bytes:
+        if not self._slots.acquire(blocking=False):
+            raise PasswordPoolBusy()
+        try:
+            return self._get_executor().submit(_pbkdf2, password, salt, iterations).result()
+        finally:
+            self._slots.release()
+
+
+def _pbkdf2(password: str, salt: bytes, iterations: int) -> bytes:
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+
+
+hasher_pool = PasswordHasherPool()
+
+
+def _parse_hash(stored_hash: str):
+    # "pbkdf2_sha256$<iterations>$<salt>$<hash>", or the legacy "<salt>:<hash>"
+    if stored_hash.startswith(ALGORITHM + "$"):
+        _, iterations, salt_hex, hash_hex = stored_hash.split("$")
+        return int(iterations), bytes.fromhex(salt_hex), hash_hex
+    salt_hex, hash_hex = stored_hash.split(":")
+    return LEGACY_ITERATIONS, bytes.fromhex(salt_hex), hash_hex
+
+
+def hash_password(password: str, iterations: int = PASSWORD_HASH_ITERATIONS) -> str:
     salt = os.urandom(16)
-    hash_bytes = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, 100000)
-    return f"{salt.hex()}:{hash_bytes.hex()}"
+    hash_bytes = hasher_pool.pbkdf2(password, salt, iterations)
+    return f"{ALGORITHM}${iterations}${salt.hex()}${hash_bytes.hex()}"
 
 def verify_password(stored_hash: str, password: str) -> bool:
     try:
-        salt_hex, hash_hex = stored_hash.split(":")
-        salt = bytes.fromhex(salt_hex)
-        hash_bytes = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, 100000)
-        return hash_bytes.hex() == hash_hex
+        iterations, salt, hash_hex = _parse_hash(stored_hash)
     except Exception:
         return False
+    hash_bytes = hasher_pool.pbkdf2(password, salt, iterations)
+    return hmac.compare_digest(hash_bytes.hex(), hash_hex)
+
+def needs_rehash(stored_hash: str) -> bool:
+    # True for legacy hashes and hashes made with fewer iterations than configured
+    try:
+        iterations, _, _ = _parse_hash(stored_hash)
+    except Exception:
+        return True
+    return not stored_hash.startswith(ALGORITHM + "$") or iterations < PASSWORD_HASH_ITERATIONS
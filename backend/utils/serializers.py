@@ -0,0 +1,79 @@
+from operator import attrgetter
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:  # optional, the standard library encoder is used without it
+    orjson = None
+
+
+def as_http_date(value, tz=None):
+    # Dates render the way Flask's JSON provider always rendered them
+    return http_date(value) if value is not None else None
+
+
+class Serializer:
+    """
+    Turns model instances into dicts from a field list fixed when the model is defined.
+
+    fields are (key, attribute, converter) tuples; converter(value, tz) is optional.
+    A field selection is compiled once into a single attrgetter and a short list of
+    converters, then reused for every row.
+    """
+
+    def __init__(self, fields):
+        self.fields = tuple(fields)
+        self.keys = frozenset(key for key, _, _ in self.fields)
+        self._plans = {}
+
+    def _plan(self, only):
+        plan = self._plans.get(only)
+        if plan is None:
+            selected = [field for field in self.fields if only is None or field[0] in only]
+            keys = tuple(key for key, _, _ in selected)
+            attributes = [attribute for _, attribute, _ in selected]
+            if len(attributes) == 1:
+                single = attrgetter(attributes[0])
+                getter = lambda obj: (single(obj),)
+            else:
+                getter = attrgetter(*attributes)
+            converters = tuple((key, convert) for key, _, convert in selected if convert is not None)
+            plan = self._plans[only] = (keys, getter, converters)
+        return plan
+
+    def __call__(self, obj, tz=None, only: frozenset | None = None) -> dict:
+        keys, getter, converters = self._plan(only)
+        data = dict(zip(keys, getter(obj)))
+        for key, convert in converters:
+            data[key] = convert(data[key], tz)
+        return data
+
+
+def parse_fields(value: str | None, allowed) -> frozenset | None:
+    """The ?fields= projection as a set of keys, None for every field. Raises ValueError on unknown keys."""
+    if not value:
+        return None
+    fields = frozenset(field.strip() for field in value.split(",") if field.strip())
+    unknown = fields - frozenset(allowed)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return fields or None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, encoding with orjson when it is installed."""
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or "indent" in kwargs:
+            return super().dumps(obj, **kwargs)
+        # Same output as the default provider: sorted keys, dates as HTTP dates
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if kwargs.get("sort_keys", self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=kwargs.get("default", self.default), option=option).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
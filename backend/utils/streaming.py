@@ -0,0 +1,33 @@
+from flask import Response, current_app, request, stream_with_context
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+CHUNK_SIZE = 200
+
+
+def wants_stream() -> bool:
+    # Opt in with ?stream=1 or by preferring NDJSON in the Accept header
+    if request.args.get("stream") == "1":
+        return True
+    return request.accept_mimetypes.best_match(["application/json", NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+
+def stream_ndjson(rows, serialize) -> Response:
+    """
+    Stream rows as NDJSON, one serialized row per line.
+
+    rows is a query, read CHUNK_SIZE rows at a time through a server-side cursor,
+    or any lazy iterable. Lines are flushed in chunks of CHUNK_SIZE, so memory
+    use doesn't depend on the result size.
+    """
+    def generate():
+        dumps = current_app.json.dumps
+        lines = []
+        for row in rows.yield_per(CHUNK_SIZE) if hasattr(rows, "yield_per") else rows:
+            lines.append(dumps(serialize(row)))
+            if len(lines) >= CHUNK_SIZE:
+                yield "\n".join(lines) + "\n"
+                lines.clear()
+        if lines:
+            yield "\n".join(lines) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
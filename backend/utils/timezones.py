@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from flask import request
+from config import DEFAULT_TIMEZONE
+
+
+def utc_now() -> datetime:
+    # starts_at/ends_at are stored as naive UTC
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def resolve_timezone(name: str | None) -> ZoneInfo:
+    try:
+        return ZoneInfo(name or DEFAULT_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown timezone: {name}")
+
+
+def parse_duration(value) -> timedelta:
+    # Durations are sent as "HH:MM"; plain numbers are minutes
+    if isinstance(value, (int, float)):
+        return timedelta(minutes=value)
+    value = str(value).strip()
+    if ":" in value:
+        hours, minutes = value.split(":", 1)
+        return timedelta(hours=int(hours), minutes=int(minutes))
+    return timedelta(minutes=int(value))
+
+
+def compute_schedule(activity_date, activity_time: str, duration, tz_name: str | None) -> tuple[datetime, datetime]:
+    """Return (starts_at, ends_at) in naive UTC for a local date, "HH:MM" time and duration."""
+    local_time = datetime.strptime(activity_time, "%H:%M").time()
+    local_start = datetime.combine(activity_date, local_time, tzinfo=resolve_timezone(tz_name))
+    starts_at = local_start.astimezone(timezone.utc).replace(tzinfo=None)
+    return starts_at, starts_at + parse_duration(duration)
+
+
+def to_zone(value: datetime | None, tz: ZoneInfo | None) -> str | None:
+    # Render a stored UTC timestamp as ISO 8601 in the requested zone (UTC by default)
+    if value is None:
+        return None
+    aware = value.replace(tzinfo=timezone.utc)
+    return aware.astimezone(tz).isoformat() if tz else aware.isoformat().replace("+00:00", "Z")
+
+
+def week_bounds(tz: ZoneInfo) -> tuple[datetime, datetime]:
+    """Start of this week's Sunday and of next Sunday, in the given zone, as naive UTC."""
+    today = datetime.now(tz).date()
+    days_since_sunday = (today.weekday() + 1) % 7  # Monday=0 ... Sunday=6
+    sunday = datetime.combine(today - timedelta(days=days_since_sunday), datetime.min.time(), tzinfo=tz)
+    next_sunday = sunday + timedelta(days=7)
+    return (
+        sunday.astimezone(timezone.utc).replace(tzinfo=None),
+        next_sunday.astimezone(timezone.utc).replace(tzinfo=None),
+    )
+
+
+def request_timezone() -> ZoneInfo | None:
+    # Callers pick the zone responses are rendered in with ?tz=<IANA name>
+    name = request.args.get("tz")
+    return resolve_timezone(name) if name else None
@@ -270,8 +270,8 @@ export default function ActivityDetailPage() {
                 <div className="flex items-start space-x-4">
                   <img
                     src={
-                      activity.organizer?.avatar_base64
-                        ? activity.organizer.avatar_base64
+                      activity.organizer?.avatar_thumbnail_url
+                        ? `http://localhost:5000${activity.organizer.avatar_thumbnail_url}`
                         : "/default-avatar.png"
                     }
                     alt={activity.organizer?.name || "Organizer"}
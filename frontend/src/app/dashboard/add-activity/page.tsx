@@ -12,7 +12,7 @@ import { ArrowLeft, Save, Calendar, Clock, Users, LinkIcon, Tag, FileText, X, Pl
 import Link from "next/link"
 import { useRouter } from "next/navigation"
 import { Badge } from "@/components/ui/badge"
-import { fetchWithAuth } from "@/lib/api"
+import { confirmOverlap, fetchWithAuth } from "@/lib/api"
 
 export default function AddActivityPage() {
   const [formData, setFormData] = useState({
@@ -170,18 +170,31 @@ export default function AddActivityPage() {
         join_link: formData.joinLink,
         description: formData.description,
         duration,
+        // Date and time are entered in the organizer's local timezone
+        timezone: Intl.DateTimeFormat().resolvedOptions().timeZone,
         materials: formData.materials,
       }
 
-      const response = await fetchWithAuth("http://localhost:5000/activities", {
-        method: "POST",
-        headers: {
-          "Content-Type": "application/json",
-        },
-        body: JSON.stringify(payload),
-      })
-
-      const data = await response.json()
+      const save = (allowOverlap: boolean) =>
+        fetchWithAuth("http://localhost:5000/activities", {
+          method: "POST",
+          headers: {
+            "Content-Type": "application/json",
+          },
+          body: JSON.stringify({ ...payload, allow_overlap: allowOverlap }),
+        })
+
+      let response = await save(false)
+      let data = await response.json()
+
+      // Overlapping sessions are only saved once the organizer confirms
+      if (response.status === 409 && data.conflicts) {
+        if (!confirmOverlap(data)) {
+          return
+        }
+        response = await save(true)
+        data = await response.json()
+      }
 
       if (response.ok) {
         router.push("/dashboard")
@@ -494,7 +507,7 @@ export default function AddActivityPage() {
                     <Input
                       type="number"
                       min="0"
-                      max="23"
+                      max="12"
                       placeholder="Hours"
                       value={formData.durationHours}
                       onChange={(e) => handleInputChange("durationHours", e.target.value)}
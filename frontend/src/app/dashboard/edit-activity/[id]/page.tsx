@@ -28,7 +28,7 @@ import {
 } from "lucide-react";
 import Link from "next/link"
 import { useRouter, useParams } from "next/navigation"
-import { fetchWithAuth } from "@/lib/api"
+import { confirmOverlap, fetchWithAuth } from "@/lib/api"
 
 export default function EditActivityPage() {
   const router = useRouter()
@@ -128,27 +128,43 @@ export default function EditActivityPage() {
     const duration = `${formData.durationHours.padStart(2, "0")}:${formData.durationMinutes.padStart(2, "0")}`
 
     try {
-      const res = await fetchWithAuth(`http://localhost:5000/activities/${activityId}`, {
-        method: "PUT",
-        headers: {
-          "Content-Type": "application/json",
-        },
-        body: JSON.stringify({
-          title: formData.title,
-          description: formData.description,
-          topic: formData.topic,
-          age_group: formData.ageGroup,
-          date: formData.date,
-          time: formData.time,
-          duration,
-          join_link: formData.joinLink,
-          materials: formData.materials,
-        }),
-      })
+      const save = (allowOverlap: boolean) =>
+        fetchWithAuth(`http://localhost:5000/activities/${activityId}`, {
+          method: "PUT",
+          headers: {
+            "Content-Type": "application/json",
+          },
+          body: JSON.stringify({
+            title: formData.title,
+            description: formData.description,
+            topic: formData.topic,
+            age_group: formData.ageGroup,
+            date: formData.date,
+            time: formData.time,
+            duration,
+            // Date and time are entered in the organizer's local timezone
+            timezone: Intl.DateTimeFormat().resolvedOptions().timeZone,
+            join_link: formData.joinLink,
+            materials: formData.materials,
+            allow_overlap: allowOverlap,
+          }),
+        })
+
+      let res = await save(false)
 
       if (!res.ok) {
-        const errData = await res.json()
-        throw new Error(errData.error || "Failed to update activity")
+        let errData = await res.json()
+        // Overlapping sessions are only saved once the organizer confirms
+        if (res.status === 409 && errData.conflicts) {
+          if (!confirmOverlap(errData)) {
+            return
+          }
+          res = await save(true)
+          errData = res.ok ? null : await res.json()
+        }
+        if (errData) {
+          throw new Error(errData.error || "Failed to update activity")
+        }
       }
 
       router.push("/dashboard")
@@ -321,7 +337,7 @@ export default function EditActivityPage() {
                     <Input
                       type="number"
                       min="0"
-                      max="23"
+                      max="12"
                       placeholder="Hours"
                       value={formData.durationHours}
                       onChange={(e) => handleInputChange("durationHours", e.target.value)}
@@ -20,6 +20,8 @@ import Link from "next/link";
 
 export default function DashboardPage() {
   const [activities, setActivities] = useState<any[]>([]);
+  // Sessions the server has archived; they are only listed by /activities/mine/history
+  const [archivedActivities, setArchivedActivities] = useState<any[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
   const [username, setUsername] = useState<string | null>(null);
@@ -31,14 +33,20 @@ export default function DashboardPage() {
 
     async function fetchActivities() {
       try {
-        const res = await fetchWithAuth("http://localhost:5000/activities/mine");
+        const [res, historyRes] = await Promise.all([
+          fetchWithAuth("http://localhost:5000/activities/mine"),
+          fetchWithAuth("http://localhost:5000/activities/mine/history"),
+        ]);
 
         if (!res.ok) {
           throw new Error(`Failed to fetch activities: ${res.statusText}`);
         }
+        if (!historyRes.ok) {
+          throw new Error(`Failed to fetch past sessions: ${historyRes.statusText}`);
+        }
 
-        const data = await res.json();
-        setActivities(data);
+        setActivities(await res.json());
+        setArchivedActivities(await historyRes.json());
       } catch (err: any) {
         setError(err.message || "Unknown error");
       } finally {
@@ -171,7 +179,7 @@ export default function DashboardPage() {
                   <p className="text-purple-100 text-sm font-medium">
                     Total Activities
                   </p>
-                  <p className="text-3xl font-bold">{activities.length}</p>
+                  <p className="text-3xl font-bold">{activities.length + archivedActivities.length}</p>
                 </div>
                 <Calendar className="w-8 h-8 text-purple-200" />
               </div>
@@ -185,7 +193,7 @@ export default function DashboardPage() {
                     Join button clicked
                   </p>
                   <p className="text-3xl font-bold">
-                    {activities.reduce(
+                    {[...activities, ...archivedActivities].reduce(
                       (sum, activity) => sum + (activity.total_times_join_pressed || 0),
                       0
                     )}
@@ -280,7 +288,50 @@ export default function DashboardPage() {
           ))}
         </div>
 
-        {activities.length === 0 && (
+        {/* Past Sessions */}
+        {archivedActivities.length > 0 && (
+          <div className="mt-12">
+            <h3 className="text-2xl font-bold text-gray-800 mb-4">Past Sessions</h3>
+            <div className="space-y-4">
+              {archivedActivities.map((activity) => (
+                <Card
+                  key={`archived-${activity.id}`}
+                  className="bg-white/70 rounded-2xl border-2 border-gray-100"
+                >
+                  <CardContent className="p-6">
+                    <h4 className="text-lg font-bold text-gray-700 mb-2">
+                      {activity.title}
+                    </h4>
+                    <div className="flex flex-wrap gap-2 mb-3">
+                      <Badge variant="outline" className="border-gray-300 text-gray-600 px-3 py-1 rounded-full">
+                        {activity.topic}
+                      </Badge>
+                      <Badge variant="outline" className="border-gray-300 text-gray-600 px-3 py-1 rounded-full">
+                        {activity.age_group}
+                      </Badge>
+                    </div>
+                    <div className="grid grid-cols-1 sm:grid-cols-3 gap-4 text-sm text-gray-500">
+                      <div className="flex items-center">
+                        <Calendar className="w-4 h-4 mr-2" />
+                        <span>{formatDate(activity.date)}</span>
+                      </div>
+                      <div className="flex items-center">
+                        <Clock className="w-4 h-4 mr-2" />
+                        <span>{activity.time}</span>
+                      </div>
+                      <div className="flex items-center">
+                        <Users className="w-4 h-4 mr-2" />
+                        <span>{activity.total_times_join_pressed || 0} Times join clicked</span>
+                      </div>
+                    </div>
+                  </CardContent>
+                </Card>
+              ))}
+            </div>
+          </div>
+        )}
+
+        {activities.length === 0 && archivedActivities.length === 0 && (
           <div className="text-center py-12">
             <div className="text-6xl mb-4">📅</div>
             <h3 className="text-2xl font-bold text-gray-600 mb-2">
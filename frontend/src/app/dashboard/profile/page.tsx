@@ -38,9 +38,9 @@ export default function ProfilePage() {
         setFormData({
           name: data.name || "",
           bio: data.bio || "",
-          avatar: data.avatar_base64 || "",
+          avatar: "",
         })
-        setPreviewImage(data.avatar_base64 || "/placeholder.svg")
+        setPreviewImage(data.avatar_url ? `http://localhost:5000${data.avatar_url}` : "/placeholder.svg")
       } catch (error) {
         console.error("Error loading profile:", error)
       }
@@ -62,7 +62,8 @@ export default function ProfilePage() {
         body: JSON.stringify({
           name: formData.name,
           bio: formData.bio,
-          avatarBase64: formData.avatar,
+          // Only upload the avatar when a new image was picked
+          ...(formData.avatar && { avatarBase64: formData.avatar }),
         }),
       })
 
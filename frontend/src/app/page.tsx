@@ -27,6 +27,9 @@ import {
 import Link from "next/link";
 import { fetchWithAuth } from "@/lib/api";
 
+// How often the list is refreshed when live updates aren't available
+const POLL_INTERVAL_MS = 60_000;
+
 const topics = [
   "All Topics",
   "Arts & Crafts",
@@ -55,6 +58,7 @@ export default function HomePage() {
   const [topics, setTopics] = useState<string[]>(["All Topics"]);
   const [ageGroups, setAgeGroups] = useState<string[]>(["All Ages"]);
   const [loading, setLoading] = useState(true);
+  const [refreshKey, setRefreshKey] = useState(0);
 
   useEffect(() => {
     const fetchActivities = async () => {
@@ -108,7 +112,74 @@ export default function HomePage() {
     fetchActivities();
     fetchTopics();
     fetchAgeGroups();
-  }, [selectedTopic, selectedAgeGroup]);
+  }, [selectedTopic, selectedAgeGroup, refreshKey]);
+
+  // Live updates while the tab is visible: edits are patched in place, anything else refetches the list.
+  // When the server has no room for another stream, the list is refreshed periodically instead
+  useEffect(() => {
+    let events: EventSource | null = null;
+    let poll: ReturnType<typeof setInterval> | null = null;
+    const refetch = () => setRefreshKey((key) => key + 1);
+
+    const connect = () => {
+      const source = new EventSource("http://localhost:5000/activities/events");
+      events = source;
+
+      source.addEventListener("activity.updated", (event) => {
+        const changes = JSON.parse((event as MessageEvent).data);
+        // A new schedule can reorder the list or move every occurrence of a series
+        if (["date", "time", "timezone", "duration", "recurrence"].some((field) => field in changes)) {
+          refetch();
+          return;
+        }
+        setActivities((current: any) =>
+          current.map((activity: any) => (activity.id === changes.id ? { ...activity, ...changes } : activity))
+        );
+      });
+      source.addEventListener("activity.deleted", (event) => {
+        const { id } = JSON.parse((event as MessageEvent).data);
+        setActivities((current: any) => current.filter((activity: any) => activity.id !== id));
+      });
+      source.addEventListener("activity.created", refetch);
+      source.addEventListener("activities.imported", refetch);
+      source.addEventListener("occurrence.updated", refetch);
+      source.addEventListener("reset", refetch);
+      source.onerror = () => {
+        // Refused streams are closed for good, dropped connections are retried by the browser
+        if (source.readyState === EventSource.CLOSED && poll === null) {
+          poll = setInterval(refetch, POLL_INTERVAL_MS);
+        }
+      };
+    };
+
+    const disconnect = () => {
+      events?.close();
+      events = null;
+      if (poll !== null) {
+        clearInterval(poll);
+        poll = null;
+      }
+    };
+
+    // Hidden tabs don't hold a connection; they catch up when shown again
+    const onVisibilityChange = () => {
+      if (document.hidden) {
+        disconnect();
+      } else if (events === null) {
+        refetch();
+        connect();
+      }
+    };
+
+    if (!document.hidden) {
+      connect();
+    }
+    document.addEventListener("visibilitychange", onVisibilityChange);
+    return () => {
+      document.removeEventListener("visibilitychange", onVisibilityChange);
+      disconnect();
+    };
+  }, []);
 
   const parseIsraelDateTime = (dateStr: string, timeStr: string) => {
     return new Date(`${dateStr}T${timeStr}:00`);
@@ -134,13 +205,14 @@ export default function HomePage() {
     });
   };
 
-  const handleJoinClick = (activityId: number) => async () => {
+  const handleJoinClick = (activityId: number, occurrence?: string) => async () => {
     try {
       const res = await fetchWithAuth(`http://localhost:5000/activities/${activityId}/join`, {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
         },
+        body: JSON.stringify(occurrence ? { occurrence } : {}),
       });
 
       if (!res.ok) {
@@ -249,7 +321,7 @@ export default function HomePage() {
               const fullDate = parseIsraelDateTime(activity.date, activity.time);
               return (
                 <Card
-                  key={activity.id}
+                  key={`${activity.id}-${activity.occurrenceStart ?? ""}`}
                   className="bg-white rounded-2xl shadow-lg hover:shadow-xl transition-all duration-300 border-2 border-purple-100 hover:border-purple-300 overflow-hidden p-0"
                 >
                   <CardHeader className="bg-gradient-to-r from-purple-100 to-pink-100 rounded-t-2xl pb-4 px-6 pt-4 m-0">
@@ -302,7 +374,7 @@ export default function HomePage() {
                           target="_blank"
                           rel="noopener noreferrer"
                           className="flex items-center justify-center"
-                          onClick={handleJoinClick(activity.id)}
+                          onClick={handleJoinClick(activity.id, activity.occurrenceStart)}
                         >
                           <Rocket className="w-5 h-5 mr-2" />
                           Quick Join
@@ -64,4 +64,12 @@ export const fetchWithAuth = async (url: string, options: RequestInit = {}) => {
   }
 
   return res;
-};
\ No newline at end of file
+};
+
+// A 409 from saving an activity lists the organizer's overlapping sessions; asks whether to save it anyway
+export const confirmOverlap = (data: any) => {
+  const conflicts = (data.conflicts || [])
+    .map((conflict: any) => `• ${conflict.title} (${new Date(conflict.startsAt).toLocaleString()})`)
+    .join("\n");
+  return window.confirm(`${data.error}:\n${conflicts}\n\nSave it anyway?`);
+};